@@ -0,0 +1,142 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fetchers import get_fetcher, get_http_fetcher
+from marktguru_scraper import ItemPages, fetch_page
+from settings import SETTINGS
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, in bursts of up to
+    `capacity`. A rate of 0 disables the limit"""
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def scrape(
+    driver,
+    fetcher,
+    url,
+    shopping_list,
+    zip_,
+    store_data,
+    set_progress,
+    concurrency: int,
+    rate: float,
+    cache=None,
+    runs=None,
+) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    bucket = TokenBucket(rate)
+    loop = asyncio.get_running_loop()
+    pages_done = 0
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+
+        async def fetch(item: str, page: int) -> tuple:
+            nonlocal pages_done
+
+            async with semaphore:
+                await bucket.acquire()
+                # Blocking fetch and parse run off the event loop
+                page_results = await loop.run_in_executor(
+                    executor,
+                    fetch_page,
+                    driver,
+                    url,
+                    item,
+                    page,
+                    zip_,
+                    store_data,
+                    fetcher,
+                    cache,
+                )
+
+            pages_done += 1
+            text = f"{pages_done} pages - '{item}' page {page + 1}"
+            if cache is not None:
+                text += f" ({cache.summary()})"
+            set_progress(("Scraping", ": ", text, 60))
+
+            return page_results
+
+        async def scrape_pages(
+            item: str, page: int, item_pages: ItemPages, item_results: dict
+        ) -> None:
+            try:
+                page_results, page_count = await fetch(item, page)
+            except AssertionError:
+                # Reached the last page
+                return
+
+            item_results[page] = page_results
+
+            # The first page schedules the others, which run concurrently
+            await asyncio.gather(
+                *[
+                    scrape_pages(item, x, item_pages, item_results)
+                    for x in item_pages.after(page, page_count, page_results)
+                ]
+            )
+
+        async def scrape_item(item: str) -> list:
+            item_results = {}
+            await scrape_pages(item, 0, ItemPages(item, runs), item_results)
+
+            return [i for page in sorted(item_results) for i in item_results[page]]
+
+        results = await asyncio.gather(*[scrape_item(x) for x in shopping_list])
+
+    return [i for item_results in results for i in item_results]
+
+
+def launch_scraper_async(
+    driver, url, shopping_list, zip_, store_data, set_progress, cache=None, runs=None
+):
+    """Scrapes (item, page) tasks concurrently on an event loop, bounded by the
+    concurrency setting and a requests-per-second token bucket. Returns the same
+    `data` list as launch_scraper"""
+    concurrency = int(store_data.get("concurrency") or SETTINGS["concurrency"])
+    rate = float(store_data.get("rate", SETTINGS["rate"]) or 0)
+
+    fetcher = get_fetcher(driver, store_data, get_http_fetcher(driver, store_data))
+
+    return asyncio.run(
+        scrape(
+            driver,
+            fetcher,
+            url,
+            shopping_list,
+            zip_,
+            store_data,
+            set_progress,
+            concurrency,
+            rate,
+            cache,
+            runs,
+        )
+    )
@@ -0,0 +1,202 @@
+"""Search page and record fixtures shared by the benchmarks and the mock server.
+
+Pages recorded from marktguru live in benchmarks/fixtures as {item}_{page}.html
+and are preferred; synthetic pages with the same layout fill in for any other
+item and page. Record new ones with
+
+    python benchmarks/fixtures.py record <item> [<item> ...] [--pages 2]
+
+and regenerate the bundled synthetic ones with
+
+    python benchmarks/fixtures.py synthetic
+"""
+
+import argparse
+import glob
+import math
+import os
+import random
+import sys
+from typing import Optional
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+sys.path.insert(0, ROOT)
+
+# History-sized frames cover many searched items
+ITEMS = ["milch", "butter", "eier", "käse", "joghurt", "brot", "äpfel", "kaffee"]
+ITEMS += [f"artikel {x}" for x in range(2000)]
+STORES = ["Aldi", "Lidl", "Rewe", "Edeka", "Penny", "Netto", "Kaufland"]
+PAGE_SIZE = 30
+
+
+def synthetic_card(n: int, item: str) -> str:
+    """An offer card in one of the layouts the selectors and fallbacks handle"""
+    store = STORES[(n * 7 + len(item)) % len(STORES)]
+    kind = n % 4
+
+    if kind == 1:
+        store_html = f'<dd class="retailer-name">{store} </dd>'
+    else:
+        store_html = f'<dd class="retailer-name"><a href="/s">{store}</a></dd>'
+    if kind == 2:
+        brand_html = f'<dd class="brand"><span>Marke{n % 7}</span></dd>'
+    else:
+        brand_html = f'<dd class="brand">Marke{n % 7}</dd>'
+    if kind == 3:
+        price_html = (
+            '<div class="prices-container"><span class="price-bubble">'
+            f"€ {n % 9},{n % 100:02d}</span></div>"
+            '<div class="info">Packung 500 g <!-- c --></div>'
+        )
+    else:
+        price_html = (
+            '<div class="prices-container"><span class="price-bubble">'
+            f'€ 1,{n % 100:02d}</span></div><div class="info"><strong>'
+            f"€ {n % 13},{n % 100:02d} / kg - 1 l</strong> Inhalt</div>"
+        )
+
+    return f"""<li class="offer-card"><a href="/o/{n}"><img src="/img/{n}.png"></a>
+<h3>Bio {item.title()} &amp; Nr. {n}  </h3>
+<dl><dt>Marke:</dt>{brand_html}<dt>Händler:</dt>{store_html}<dt>Gültig:</dt>
+<dd class="valid">22.12. - 25.12.</dd></dl>{price_html}
+<script>window.offer={n}</script></li>"""
+
+
+def synthetic_page(
+    item: str,
+    page: int = 0,
+    total: int = PAGE_SIZE * 3,
+    zip_: str = "10713",
+    page_size: int = PAGE_SIZE,
+) -> str:
+    """A search results page in marktguru's layout: consent root, location
+    header, headline with the total, offer cards and pagination links. Past the
+    last page the headline no longer names the item, as on the site"""
+    pages = max(1, math.ceil(total / page_size))
+    first = page * page_size
+    cards = "\n".join(
+        [synthetic_card(x, item) for x in range(first, min(first + page_size, total))]
+    )
+    headline = f"{total} Angebote für {item}" if page < pages else "Keine Angebote"
+    pagination = "".join(
+        [
+            f'<a href="/search/{item}?title={item}&amp;page={x}">{x + 1}</a>'
+            for x in range(pages)
+        ]
+    )
+
+    return f"""<!DOCTYPE html><html><head><title>{item} - marktguru</title>
+<style>li {{ list-style: none }}</style></head><body>
+<div id="usercentrics-root"></div>
+<header><nav><ul><li><a href="/">Home</a></li><li><a>Prospekte</a></li></ul>
+<input type="search" placeholder="Suche"></nav>
+<div class="location"><span class="location-default-text">Standort</span>
+<span class="location-text">{zip_} Berlin</span><input type="text" placeholder="PLZ"></div>
+</header>
+<main><h1 class="headline">{headline}</h1>
+<ul class="offer-list">{cards}</ul><nav class="pagination">{pagination}</nav></main>
+<footer><ul><li>Impressum</li><li>Datenschutz</li></ul></footer></body></html>"""
+
+
+def load_page(item: str, page: int) -> Optional[str]:
+    """The recorded page for the item, if there is one"""
+    path = os.path.join(FIXTURES_DIR, f"{item}_{page}.html")
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def load_pages() -> dict:
+    """Every recorded page, keyed by (item, page)"""
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.html"))):
+        item, page = os.path.basename(path)[: -len(".html")].rsplit("_", 1)
+        with open(path, "r", encoding="utf-8") as f:
+            pages[(item, int(page))] = f.read()
+
+    return pages
+
+
+def synthetic_records(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Scraped records as generate_output receives them, over many items"""
+    rng = random.Random(seed)
+
+    records = []
+    for _ in range(rows):
+        item = rng.choice(ITEMS)
+        name = rng.choice([f"Bio {item}", f"{item} extra", f"Frische {item}"])
+        price = rng.choice(
+            [f"€ {rng.randint(19, 999) / 100:.2f}".replace(".", ","), "€ k.A."]
+        )
+        records.append(
+            {
+                "Item": item,
+                "Name": name,
+                "Date valid": rng.choice(["22.12. - 25.12.", "27.12. - 31.12."]),
+                "Store": rng.choice(STORES),
+                "Brand": rng.choice(["Marke1", "Marke2", "Marke3", ""]),
+                "Price": f"{price}/1 kg",
+                "Note": rng.choice(["", "Aktion", "Nur online"]),
+            }
+        )
+
+    return pd.DataFrame(records)
+
+
+def write_synthetic(items: list = ["milch", "käse"], pages: int = 2) -> None:
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for item in items:
+        for page in range(pages):
+            with open(
+                os.path.join(FIXTURES_DIR, f"{item}_{page}.html"), "w", encoding="utf-8"
+            ) as f:
+                f.write(synthetic_page(item, page))
+
+
+def record(items: list, pages: int, zip_: str, chrome: str) -> None:
+    """Saves live search pages with the app's own driver and location setup"""
+    from marktguru_scraper import ensure_location
+    from selenium_init import get_driver
+    from settings import SETTINGS
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    driver = get_driver(chrome or SETTINGS["path"], headless=True)
+    try:
+        ensure_location(driver, items[0], zip_)
+        for item in items:
+            for page in range(pages):
+                driver.get(
+                    f"https://www.marktguru.de/search/{item}?title={item}&page={page}"
+                )
+                with open(
+                    os.path.join(FIXTURES_DIR, f"{item}_{page}.html"),
+                    "w",
+                    encoding="utf-8",
+                ) as f:
+                    f.write(driver.page_source)
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="record live search pages")
+    record_parser.add_argument("items", nargs="+")
+    record_parser.add_argument("--pages", type=int, default=2)
+    record_parser.add_argument("--zip", default="10713")
+    record_parser.add_argument("--chrome", default=None, help="Chrome executable")
+
+    commands.add_parser("synthetic", help="write the synthetic fixture pages")
+
+    args = parser.parse_args()
+    if args.command == "record":
+        record(args.items, args.pages, args.zip, args.chrome)
+    else:
+        write_synthetic()
@@ -0,0 +1,158 @@
+"""Load harness: runs the scraper against the local mock server and reports
+throughput, page latency and peak memory.
+
+    python benchmarks/load_harness.py --chrome <chrome.exe> --items milch käse \\
+        --engine asyncio --concurrency 8 --latency 300 --error-rate 0.05
+
+Needs Chrome and chromedriver like the app. Location sessions are kept in a
+temporary directory so the mock's never replace the real ones.
+"""
+
+import argparse
+import logging
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from fixtures import ROOT  # puts the app modules on the import path
+from mock_server import create_app
+from werkzeug.serving import make_server
+
+import async_engine
+import fetchers
+import location_session
+import marktguru_scraper
+from selenium_init import get_driver
+from settings import SETTINGS
+
+
+def serve(app) -> tuple:
+    """Starts the app on a free local port and returns the server and its URL"""
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request lines
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def timed_fetch_page(latencies: list, errors: list):
+    """fetch_page recording how long each page took and which failed. A failed
+    page ends its item like the last page does, so the run carries on"""
+    fetch_page = marktguru_scraper.fetch_page
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fetch_page(*args, **kwargs)
+        except AssertionError:
+            raise  # past the last page, or a page without results
+        except Exception as e:
+            errors.append(repr(e))
+            raise AssertionError from e
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    return wrapper
+
+
+def run(args) -> dict:
+    server, base_url = serve(
+        create_app(args.latency / 1000, args.jitter / 1000, args.error_rate, args.depth)
+    )
+    url = f"{base_url}/search"
+
+    store_data = dict(
+        SETTINGS,
+        engine=args.engine,
+        fetcher=args.fetcher,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        rate=args.rate,
+    )
+
+    # An error page has no headline to wait for, Chrome would wait the longest
+    fetchers.CARDS_TIMEOUT = args.timeout
+
+    sessions = tempfile.mkdtemp()
+    location_session.SESSIONS_DIR = sessions
+
+    driver = get_driver(args.chrome, True, "Chrome-harness", store_data)
+    latencies, errors = [], []
+    wrapper = timed_fetch_page(latencies, errors)
+    marktguru_scraper.fetch_page = wrapper
+    async_engine.fetch_page = wrapper
+
+    try:
+        marktguru_scraper.set_location(driver, args.items[0], args.zip, url=url)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        if args.engine == "asyncio":
+            data = async_engine.launch_scraper_async(
+                driver, url, args.items, args.zip, store_data, lambda x: None
+            )
+        elif args.workers > 1:
+            data = marktguru_scraper.launch_scraper_pool(
+                driver,
+                args.chrome,
+                url,
+                args.items,
+                args.zip,
+                store_data,
+                lambda x: None,
+                args.workers,
+            )
+        else:
+            data = marktguru_scraper.launch_scraper(
+                driver, url, args.items, args.zip, store_data, lambda x: None
+            )
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        driver.quit()
+        server.shutdown()
+        shutil.rmtree(sessions, ignore_errors=True)
+
+    quantiles = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else [0]
+
+    return {
+        "pages": len(latencies),
+        "errors": len(errors),
+        "records": len(data),
+        "seconds": elapsed,
+        "pages/sec": len(latencies) / elapsed,
+        "p50 latency": statistics.median(latencies) if latencies else 0,
+        "p95 latency": quantiles[-1],
+        "peak memory MB": peak / 1024 / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chrome", default=SETTINGS["path"], help="Chrome executable")
+    parser.add_argument("--items", nargs="+", default=["milch", "käse", "brot"])
+    parser.add_argument("--zip", default=SETTINGS["zip"])
+    parser.add_argument("--engine", choices=["driver", "asyncio"], default="driver")
+    parser.add_argument("--fetcher", choices=["selenium", "http"], default="selenium")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=SETTINGS["concurrency"])
+    parser.add_argument("--rate", type=float, default=0, help="requests/sec, 0 off")
+    parser.add_argument("--latency", type=float, default=200, help="ms")
+    parser.add_argument("--jitter", type=float, default=100, help="ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--depth", type=int, default=3, help="pages per item")
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="seconds to wait for a page"
+    )
+    args = parser.parse_args()
+
+    for name, value in run(args).items():
+        print(
+            f"{name:<16}{value:10.3f}"
+            if isinstance(value, float)
+            else f"{name:<16}{value:10}"
+        )
@@ -0,0 +1,114 @@
+"""Local stand-in for marktguru to load test the scraper against.
+
+Serves the recorded fixture pages, or synthetic ones, for any item, page and
+ZIP code, after a configurable latency with jitter, failing a share of the
+requests, and with a configurable number of pages per item. The search page
+has the consent root, location header and ZIP input set_location works
+through; the chosen ZIP code is kept in a cookie like the site's session.
+
+    python benchmarks/mock_server.py --port 5050 --latency 200 --jitter 100
+"""
+
+import argparse
+import random
+import re
+import time
+
+from fixtures import PAGE_SIZE, load_page, synthetic_page
+from flask import Flask, make_response, request
+
+LOCATION_TEXT = re.compile(r'(class="[^"]*\blocation-text\b[^"]*"[^>]*>)[^<]*')
+
+# Emulates the location picker: the ZIP input is hidden until the location is
+# clicked, Enter lists the matching addresses, ArrowDown focuses the first and
+# Enter on it sets the location cookie and text
+LOCATION_JS = """
+<script>
+document.addEventListener("DOMContentLoaded", () => {
+  const input = document.querySelector("header input[placeholder='PLZ']");
+  const suggestions = document.createElement("ul");
+  input.style.display = "none";
+  input.after(suggestions);
+  document.querySelector(".location-default-text").addEventListener("click", () => {
+    input.style.display = "inline";
+    input.focus();
+  });
+  input.addEventListener("keydown", (e) => {
+    if (e.key === "Enter") {
+      suggestions.innerHTML = `<li tabindex="0">${input.value} Berlin</li>`;
+    } else if (e.key === "ArrowDown" && suggestions.firstChild) {
+      suggestions.firstChild.focus();
+    }
+  });
+  suggestions.addEventListener("keydown", (e) => {
+    if (e.key === "Enter") {
+      const zip = input.value.trim();
+      document.cookie = `zip=${zip}; path=/`;
+      localStorage.setItem("zip", zip);
+      document.querySelector(".location-text").textContent = `${zip} Berlin`;
+      suggestions.innerHTML = "";
+      input.style.display = "none";
+    }
+  });
+});
+</script>
+"""
+
+
+def create_app(
+    latency: float = 0.2,
+    jitter: float = 0.1,
+    error_rate: float = 0.0,
+    depth: int = 3,
+    seed: int = 0,
+) -> Flask:
+    """`latency` and `jitter` in seconds, `error_rate` from 0 to 1, `depth` in
+    pages per item"""
+    app = Flask(__name__)
+    rng = random.Random(seed)
+
+    def respond(html: str, status: int = 200):
+        time.sleep(max(0, latency + rng.uniform(-jitter, jitter)))
+        if rng.random() < error_rate:
+            return make_response("Service unavailable", 503)
+
+        return make_response(html, status)
+
+    def located(html: str) -> str:
+        """The page with the location of the session, none before it is set"""
+        zip_ = request.cookies.get("zip", "")
+        html = LOCATION_TEXT.sub(
+            lambda x: x.group(1) + (f"{zip_} Berlin" if zip_ else ""), html, count=1
+        )
+
+        return html.replace("</body>", LOCATION_JS + "</body>")
+
+    @app.route("/")
+    def home():
+        return respond(located(synthetic_page("", total=0)))
+
+    @app.route("/search/<item>")
+    def search(item: str):
+        page = int(request.args.get("page", 0))
+
+        html = load_page(item, page)
+        if html is None:
+            html = synthetic_page(item, page, total=depth * PAGE_SIZE)
+
+        return respond(located(html))
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--latency", type=float, default=200, help="ms")
+    parser.add_argument("--jitter", type=float, default=100, help="ms")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--depth", type=int, default=3, help="pages per item")
+    args = parser.parse_args()
+
+    create_app(
+        args.latency / 1000, args.jitter / 1000, args.error_rate, args.depth
+    ).run(port=args.port, threaded=True)
@@ -0,0 +1,84 @@
+"""Times the price parsing, lowest price marker and auto filter of
+generate_output against the row-wise versions they replaced, on synthetic
+records, and checks that both give the same frame. The auto filter now scores
+names fuzzily instead of by suffix, so only its timing is compared.
+
+    python benchmarks/output_transforms.py [rows]
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import synthetic_records
+
+from helpers import rank_similarity
+from marktguru_scraper import lowest_price_marker, parse_prices
+
+
+def legacy_rank_similarity(df: pd.DataFrame) -> pd.DataFrame:
+    groups = []
+    for name, group in df.groupby(["Item"]):
+        groups.append(group[group["Name"].str.endswith(name)])
+
+    return pd.concat(groups)
+
+
+def legacy_prices(df: pd.DataFrame, lp: str) -> pd.DataFrame:
+    df = df.copy()
+    df[["Price", "Unit"]] = df["Price"].str.split("/", expand=True)
+
+    def str_to_float(x: str) -> float:
+        try:
+            return float(x.split(" ")[1].replace(",", "."))
+        except ValueError:
+            return 999.9
+
+    df["Price"] = df["Price"].apply(lambda x: str_to_float(x))
+    df["LP"] = df.groupby([lp])["Price"].transform("min")
+    df["Lowest price across stores"] = df.apply(
+        lambda x: f"✅ {x[lp]}" if x["LP"] == x["Price"] else "", axis=1
+    )
+
+    return df.drop(["LP"], axis=1)
+
+
+def prices(df: pd.DataFrame, lp: str) -> pd.DataFrame:
+    # Same steps as generate_output
+    df = df.copy()
+    df[["Price", "Unit"]] = df["Price"].str.split("/", expand=True)
+
+    df["Price"] = parse_prices(df["Price"])
+    df["Lowest price across stores"] = lowest_price_marker(df, lp)
+
+    return df
+
+
+def timed(function, *args) -> tuple:
+    start = time.perf_counter()
+    result = function(*args)
+
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    df = synthetic_records(rows)
+
+    for label, before, after, args, same in [
+        ("rank_similarity", legacy_rank_similarity, rank_similarity, (df,), False),
+        ("prices + lowest price", legacy_prices, prices, (df, "Item"), True),
+    ]:
+        expected, before_time = timed(before, *args)
+        result, after_time = timed(after, *args)
+        if same:
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+        print(
+            f"{label:<24}{before_time:8.3f}s -> {after_time:.3f}s "
+            f"({before_time / after_time:.0f}x, {rows} rows)"
+        )
@@ -0,0 +1,153 @@
+"""Benchmark suite for parsing and output. Times search page parsing with each
+parser backend on the fixture pages, then rank_similarity, write_grouped_excel
+and generate_output on synthetic record sets, and compares the timings with a
+JSON baseline.
+
+    python benchmarks/suite.py                  # compare with the baseline
+    python benchmarks/suite.py --save           # record a new baseline
+    python benchmarks/suite.py --sizes 1000 100000 --threshold 0.25
+
+Exits with 1 when a benchmark is more than `threshold` slower than its
+baseline. Timings are the best of several repeats, fewer for large sets.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+
+from fixtures import ROOT, load_pages, synthetic_records
+
+from helpers import rank_similarity
+from marktguru_scraper import generate_output, parse_page, write_grouped_excel
+from parsers import PARSERS
+from settings import SETTINGS
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def repeats(rows: int) -> int:
+    return max(1, min(5, 100_000 // rows))
+
+
+def parsing_benchmarks() -> dict:
+    pages = load_pages()
+
+    results = {}
+    for parser in PARSERS:
+        store_data = dict(SETTINGS, parser=parser)
+        results[f"parse_page[{parser}]"] = best_of(
+            lambda: [
+                parse_page(html, item, store_data) for (item, _), html in pages.items()
+            ],
+            repeat=5,
+        )
+
+    return results
+
+
+def output_benchmarks(sizes: list) -> dict:
+    results = {}
+    for rows in sizes:
+        df = synthetic_records(rows)
+        records = df.to_dict("records")
+        repeat = repeats(rows)
+
+        results[f"rank_similarity[{rows}]"] = best_of(
+            lambda: rank_similarity(df), repeat
+        )
+
+        # Excel writing on its own, with the frame generate_output would write
+        sorted_df = df.sort_values(["Store", "Item"])
+        results[f"write_grouped_excel[{rows}]"] = best_of(
+            lambda: write_grouped_excel(sorted_df, "bench.xlsx"), repeat
+        )
+
+        results[f"generate_output[{rows}]"] = best_of(
+            lambda: os.remove(generate_output(records, "Item", [], True)), repeat
+        )
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Prints each timing against its baseline and returns the regressions"""
+    regressions = []
+    for name, seconds in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:<36}{seconds:10.4f}s  (no baseline)")
+            continue
+
+        change = seconds / before - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36}{seconds:10.4f}s  {before:10.4f}s  {change:+7.1%}{flag}")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write a new baseline")
+    args = parser.parse_args()
+
+    warnings.simplefilter(action="ignore", category=FutureWarning)
+
+    results = parsing_benchmarks()
+    # generate_output writes its files to the working directory
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        results.update(output_benchmarks(args.sizes))
+        os.chdir(ROOT)
+
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"Saved {len(results)} timings to {args.baseline}")
+        sys.exit(0)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        if saved["machine"] != platform.node():
+            print(
+                f"Baseline recorded on {saved['machine']}, timings may not compare. "
+                "Run with --save first to record one for this machine"
+            )
+
+    regressions = compare(results, baseline, args.threshold)
+    if len(regressions) > 0:
+        print(f"{len(regressions)} benchmark(s) over {args.threshold:.0%} slower")
+        sys.exit(1)
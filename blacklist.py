@@ -0,0 +1,128 @@
+import re
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+REGEX_PREFIX = "re:"
+WILDCARDS = re.compile(r"[*?]")
+ANCHOR = re.compile(r"\^|\\A")
+
+
+def wildcard_to_regex(pattern: str) -> str:
+    """`*` matches any text and `?` one character, the rest literally. Leading
+    and trailing `*` leave the regex unanchored instead, so "*light*" is a plain
+    substring search without backtracking"""
+    parts = WILDCARDS.split(pattern)
+    wildcards = WILDCARDS.findall(pattern)
+
+    regex = re.escape(parts[0])
+    for wildcard, part in zip(wildcards, parts[1:]):
+        regex += (".*" if wildcard == "*" else ".") + re.escape(part)
+
+    regex = rf"\A{regex}\Z"
+    if regex.startswith(r"\A.*"):
+        regex = regex[len(r"\A.*") :]
+    if regex.endswith(r".*\Z"):
+        regex = regex[: -len(r".*\Z")]
+
+    return regex
+
+
+def compile_alternatives(regexes: list) -> Optional[re.Pattern]:
+    if len(regexes) == 0:
+        return None
+
+    try:
+        return re.compile("|".join(regexes), re.IGNORECASE)
+    except re.error as e:
+        raise Exception(
+            f"Warning: The blacklist patterns could not be combined ({e}). Please check the 're:' lines and retry"
+        )
+
+
+def standalone(regex: re.Pattern) -> bool:
+    """Whether the regex only means the same on its own: group numbers and
+    names, and so backreferences, would shift or clash in an alternation, and
+    global inline flags such as (?i) are only allowed at the start"""
+    return regex.groups > 0 or regex.flags != re.compile("").flags
+
+
+class Blacklist:
+    """Blacklist lines compiled once: exact names go in a set, wildcard and
+    regex lines ("re:" prefix) into two combined regexes, one for the patterns
+    anchored at the start, only tried there, and one searched. Regexes with
+    groups or inline flags are searched on their own. Matching ignores case"""
+
+    def __init__(self, lines: tuple) -> None:
+        self.exact = set()
+        self.standalone = []
+        anchored = []
+        unanchored = []
+
+        for line in lines:
+            line = line.strip()
+            if line.startswith(REGEX_PREFIX):
+                regex = line[len(REGEX_PREFIX) :].strip()
+                try:
+                    compiled = re.compile(regex, re.IGNORECASE)
+                except re.error as e:
+                    raise Exception(
+                        f"Warning: Blacklist line '{line}' is not a valid regular expression ({e}). Please fix it and retry"
+                    )
+                if standalone(re.compile(regex)):
+                    self.standalone.append(compiled)
+                    continue
+            elif WILDCARDS.search(line):
+                regex = wildcard_to_regex(line)
+            elif line != "":
+                self.exact.add(line.casefold())
+                continue
+            else:
+                continue
+
+            # Mixing anchored and unanchored branches defeats the regex engine's
+            # prefix optimizations, so the anchored ones are matched separately
+            anchor = ANCHOR.match(regex)
+            if anchor is not None and "|" not in regex:
+                anchored.append(f"(?:{regex[anchor.end() :]})")
+            else:
+                unanchored.append(f"(?:{regex})")
+
+        self.anchored = compile_alternatives(anchored)
+        self.unanchored = compile_alternatives(unanchored)
+
+    def matches(self, values: pd.Series) -> np.ndarray:
+        # Names repeat across stores and runs, so each distinct one is checked once
+        codes, uniques = pd.factorize(values.fillna("").astype(str))
+        uniques = uniques.tolist()
+
+        tests = [lambda x: x.casefold() in self.exact]
+        if self.anchored is not None:
+            tests.append(self.anchored.match)
+        if self.unanchored is not None:
+            tests.append(self.unanchored.search)
+        tests.extend([x.search for x in self.standalone])
+
+        matched = np.fromiter(
+            (any(test(x) for test in tests) for x in uniques),
+            dtype=bool,
+            count=len(uniques),
+        )
+
+        return matched[codes]
+
+    def mask(self, df: pd.DataFrame, columns: list = ["Name", "Brand"]) -> np.ndarray:
+        """True for the rows where any of the columns is blacklisted"""
+        masked = np.zeros(len(df), dtype=bool)
+        for column in columns:
+            if column in df:
+                masked |= self.matches(df[column])
+
+        return masked
+
+
+@lru_cache(maxsize=8)
+def compile_blacklist(lines: tuple) -> Blacklist:
+    return Blacklist(lines)
@@ -51,7 +51,7 @@ main = html.Div(
                                         # ---------------------------
                                         style={"height": "16rem", "resize": "none"},
                                         draggable=False,
-                                        placeholder="Put items you don't want to see in search results here. Temporarily unlist an item by prepending '#' to the name",
+                                        placeholder="Put items or brands you don't want to see in search results here. Use '*' and '?' as wildcards (e.g. '*light*'), or prefix a regular expression with 're:'. Temporarily unlist an item by prepending '#' to the name",
                                         id="item-blacklist",
                                     ),
                                 ],
@@ -72,6 +72,12 @@ main = html.Div(
                             id="scrape-button",
                             className="controls-buttons",
                         ),
+                        dbc.Checkbox(
+                            id="refresh-checkbox",
+                            label="Force refresh",
+                            value=False,
+                            className="controls-buttons",
+                        ),
                         dbc.Button(
                             "Stop",
                             color="primary",
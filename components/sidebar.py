@@ -1,6 +1,7 @@
 import dash_bootstrap_components as dbc
 from dash import dcc, html
 
+from parsers import PARSERS
 from settings import SETTINGS
 
 sidebar = html.Div(
@@ -105,6 +106,21 @@ sidebar = html.Div(
                                                     target="filter",
                                                     placement="bottom",
                                                 ),
+                                                dbc.Label("Auto filtering threshold"),
+                                                dbc.Input(
+                                                    type="number",
+                                                    min=0,
+                                                    max=1,
+                                                    step=0.05,
+                                                    value=SETTINGS["filter_threshold"],
+                                                    size="md",
+                                                    id="filter-threshold-input",
+                                                ),
+                                                dbc.Tooltip(
+                                                    "How closely a product name must match the item searched, from 0 to 1. Lower keeps more results",
+                                                    target="filter-threshold-input",
+                                                    placement="bottom",
+                                                ),
                                             ],
                                             className="mb-3",
                                         ),
@@ -230,6 +246,344 @@ sidebar = html.Div(
                             label="HTML",
                             style={"background-color": "white"},
                         ),
+                        dbc.Tab(
+                            html.Div(
+                                [
+                                    html.Div(
+                                        [
+                                            dbc.Label("Chrome workers"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                max=8,
+                                                step=1,
+                                                value=SETTINGS["workers"],
+                                                size="md",
+                                                id="workers-input",
+                                            ),
+                                            dbc.Tooltip(
+                                                "Number of headless Chrome instances scraping the shopping list in parallel",
+                                                target="workers-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Scraping engine"),
+                                            dbc.RadioItems(
+                                                options=[
+                                                    {
+                                                        "label": "Chrome workers",
+                                                        "value": "driver",
+                                                    },
+                                                    {
+                                                        "label": "Asyncio",
+                                                        "value": "asyncio",
+                                                    },
+                                                ],
+                                                value=SETTINGS["engine"],
+                                                id="engine-input",
+                                                inline=True,
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Concurrent pages"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                max=32,
+                                                step=1,
+                                                value=SETTINGS["concurrency"],
+                                                size="md",
+                                                id="concurrency-input",
+                                            ),
+                                            dbc.Label("Requests per second"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=0,
+                                                step=0.5,
+                                                value=SETTINGS["rate"],
+                                                size="md",
+                                                id="rate-input",
+                                            ),
+                                            dbc.Tooltip(
+                                                "Asyncio engine and HTTP fetcher limits. 0 requests per second disables the rate limit",
+                                                target="rate-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Fetch pages with"),
+                                            dbc.RadioItems(
+                                                options=[
+                                                    {
+                                                        "label": "Chrome",
+                                                        "value": "selenium",
+                                                    },
+                                                    {
+                                                        "label": "HTTP (Chrome fallback)",
+                                                        "value": "http",
+                                                    },
+                                                ],
+                                                value=SETTINGS["fetcher"],
+                                                id="fetcher-input",
+                                                inline=True,
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("HTML parser"),
+                                            dbc.RadioItems(
+                                                options=[
+                                                    {"label": x, "value": x}
+                                                    for x in PARSERS
+                                                ],
+                                                value=SETTINGS["parser"],
+                                                id="parser-input",
+                                                inline=True,
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Extract cards"),
+                                            dbc.RadioItems(
+                                                options=[
+                                                    {
+                                                        "label": "From page source",
+                                                        "value": "html",
+                                                    },
+                                                    {
+                                                        "label": "In browser (JS)",
+                                                        "value": "js",
+                                                    },
+                                                ],
+                                                value=SETTINGS["extraction"],
+                                                id="extraction-input",
+                                                inline=True,
+                                            ),
+                                            dbc.Tooltip(
+                                                "In-browser extraction applies to pages fetched with Chrome",
+                                                target="extraction-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Page cache lifetime (hours)"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=0,
+                                                step=1,
+                                                value=SETTINGS["cache_ttl"],
+                                                size="md",
+                                                id="cache-ttl-input",
+                                            ),
+                                            dbc.Label("Page cache size (MB)"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                step=1,
+                                                value=SETTINGS["cache_size"],
+                                                size="md",
+                                                id="cache-size-input",
+                                            ),
+                                            dbc.Tooltip(
+                                                "Reuses search pages scraped recently for the same ZIP code and selectors. 0 hours disables the cache",
+                                                target="cache-ttl-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Checkbox(
+                                                id="incremental-input",
+                                                label="Incremental scraping",
+                                                value=SETTINGS["incremental"],
+                                            ),
+                                            dbc.Tooltip(
+                                                "Reuses items whose offers are all still valid, and items whose first page hasn't changed since the last run",
+                                                target="incremental-input",
+                                                placement="bottom",
+                                            ),
+                                            dbc.Label(
+                                                "Reuse items fetched within (hours)"
+                                            ),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                step=1,
+                                                value=SETTINGS["incremental_age"],
+                                                size="md",
+                                                id="incremental-age-input",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Label("Output formats"),
+                                            dbc.Checklist(
+                                                options=[
+                                                    {"label": "Excel", "value": "xlsx"},
+                                                    {
+                                                        "label": "Parquet",
+                                                        "value": "parquet",
+                                                    },
+                                                    {"label": "CSV", "value": "csv"},
+                                                    {
+                                                        "label": "SQLite",
+                                                        "value": "sqlite",
+                                                    },
+                                                ],
+                                                value=SETTINGS["output_formats"],
+                                                id="output-formats-input",
+                                                inline=True,
+                                            ),
+                                            dbc.Tooltip(
+                                                "Files written next to each other with the same name. Parquet and SQLite keep Price as a number for further analysis",
+                                                target="output-formats-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Checkbox(
+                                                id="history-input",
+                                                label="Keep price history",
+                                                value=SETTINGS["history"],
+                                            ),
+                                            dbc.Tooltip(
+                                                "Appends every run's records to history.sqlite, indexed by item, store and day",
+                                                target="history-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Checkbox(
+                                                id="tracing-input",
+                                                label="Trace runs",
+                                                value=SETTINGS["tracing"],
+                                            ),
+                                            dbc.Tooltip(
+                                                "Times each stage and page of a run, writes it to traces/ as JSON lines and shows a summary when done",
+                                                target="tracing-input",
+                                                placement="bottom",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Checkbox(
+                                                id="pool-input",
+                                                label="Keep Chrome running between runs",
+                                                value=SETTINGS["pool"],
+                                            ),
+                                            dbc.Tooltip(
+                                                "Reuses a warm browser with its location already set, so back-to-back runs start scraping right away. Browsers are replaced when too old or after too many pages, and closed when idle",
+                                                target="pool-input",
+                                                placement="bottom",
+                                            ),
+                                            dbc.Label(
+                                                "Replace browsers after (minutes)"
+                                            ),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                step=1,
+                                                value=SETTINGS["pool_max_age"],
+                                                size="md",
+                                                id="pool-max-age-input",
+                                            ),
+                                            dbc.Label("Replace browsers after (pages)"),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                step=1,
+                                                value=SETTINGS["pool_max_pages"],
+                                                size="md",
+                                                id="pool-max-pages-input",
+                                            ),
+                                            dbc.Label(
+                                                "Close idle browsers after (minutes)"
+                                            ),
+                                            dbc.Input(
+                                                type="number",
+                                                min=1,
+                                                step=1,
+                                                value=SETTINGS["pool_idle"],
+                                                size="md",
+                                                id="pool-idle-input",
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                    html.Div(
+                                        [
+                                            dbc.Checkbox(
+                                                id="lean-pages-input",
+                                                label="Lean pages",
+                                                value=SETTINGS["lean_pages"],
+                                            ),
+                                            dbc.Tooltip(
+                                                "Chrome skips the requests matching the blocked URLs, one pattern per line with '*' matching anything. Images, media, fonts and trackers by default",
+                                                target="lean-pages-input",
+                                                placement="bottom",
+                                            ),
+                                            dbc.Textarea(
+                                                style={"height": "8rem"},
+                                                value="\n".join(
+                                                    SETTINGS["blocked_urls"]
+                                                ),
+                                                id="blocked-urls-input",
+                                            ),
+                                            dbc.Label("Page load"),
+                                            dbc.RadioItems(
+                                                options=[
+                                                    {
+                                                        "label": "Complete",
+                                                        "value": "normal",
+                                                    },
+                                                    {
+                                                        "label": "Eager (DOM ready)",
+                                                        "value": "eager",
+                                                    },
+                                                ],
+                                                value=SETTINGS["page_load"],
+                                                id="page-load-input",
+                                                inline=True,
+                                            ),
+                                        ],
+                                        className="mb-3",
+                                    ),
+                                ],
+                                id="tab-4",
+                            ),
+                            className="p-2",
+                            label="Performance",
+                            style={"background-color": "white"},
+                        ),
                     ],
                 ),
             ],
@@ -0,0 +1,307 @@
+import os
+import subprocess
+import threading
+import time
+import urllib.request
+from functools import lru_cache
+from typing import Optional
+
+import diskcache
+import psutil
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver import Chrome, ChromeOptions
+
+from selenium_init import (
+    block_urls,
+    check_paths,
+    get_blocked_urls,
+    get_driver,
+    get_options,
+)
+from settings import SETTINGS
+from tracing import span
+
+POOL_DIR = "driver_pool"
+
+# Switches chromedriver passes to the Chrome it launches itself
+LAUNCH_ARGUMENTS = [
+    "--remote-debugging-port=0",  # any free port, written to DevToolsActivePort
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--disable-default-apps",
+    "--disable-popup-blocking",
+    "--disable-hang-monitor",
+    "--disable-sync",
+    "--password-store=basic",
+]
+
+if os.name == "nt":
+    DETACHED = {
+        "creationflags": subprocess.DETACHED_PROCESS
+        | subprocess.CREATE_NEW_PROCESS_GROUP
+    }
+else:
+    DETACHED = {"start_new_session": True}
+
+
+class PooledChrome(Chrome):
+    """Chrome attached to a pooled browser over its DevTools port. Counts the
+    pages it loads; quit() only detaches, the browser keeps running"""
+
+    def __init__(self, options: ChromeOptions, user_data_dir: str, entry: dict):
+        super().__init__(options=options)
+        self.user_data_dir = user_data_dir
+        self.located_for = entry.get("located_for")
+        self.warm = entry["pages"] > 0 or self.located_for is not None
+        self.pages = 0
+        self.recycled = False
+
+    def get(self, url: str) -> None:
+        super().get(url)
+        self.pages += 1
+
+
+def owner() -> tuple:
+    process = psutil.Process()
+
+    return process.pid, process.create_time()
+
+
+def process_alive(pid: int, created: float) -> bool:
+    try:
+        return psutil.Process(pid).create_time() == created
+    except psutil.Error:
+        return False
+
+
+class DriverPool:
+    """Chrome browsers kept running between scrapes, one per profile directory.
+
+    A scrape leases the browser of its profile, attaching a new chromedriver
+    to it, and releases it when done. The browsers are started detached, so
+    they outlive the scrape's process with their cookies and location, and
+    the pool's state is kept on disk for the next process. A browser is
+    replaced when it fails the health check or is past `pool_max_age` minutes
+    or `pool_max_pages`, and shut down after `pool_idle` minutes unused"""
+
+    def __init__(self, directory: str = POOL_DIR) -> None:
+        self.store = diskcache.Cache(directory)
+
+    def lease(
+        self, path_: str, store_data: dict, user_data_dir: str = "Chrome-pool"
+    ) -> PooledChrome:
+        check_paths(path_)
+
+        max_age = 60 * float(store_data.get("pool_max_age", SETTINGS["pool_max_age"]))
+        max_pages = int(store_data.get("pool_max_pages", SETTINGS["pool_max_pages"]))
+        idle = 60 * float(store_data.get("pool_idle", SETTINGS["pool_idle"]))
+
+        me = owner()
+        with self.store.transact():
+            entry = self.store.get(user_data_dir)
+            if entry is not None and entry["owner"] not in (None, me):
+                if process_alive(*entry["owner"]):
+                    raise Exception(
+                        "Warning: The pooled Chrome is still used by another scrape. Please retry when it is done"
+                    )
+            self.store.set(user_data_dir, dict(entry or {}, owner=me))
+
+        if entry is not None and entry.get("port") is None:
+            entry = None  # claimed by a scrape that ended before it started
+
+        recycled = False
+        if entry is not None and (
+            time.time() - entry["started"] > max_age
+            or entry["pages"] >= max_pages
+            or not self.healthy(entry)
+        ):
+            self.kill(entry)
+            entry, recycled = None, True
+
+        for attempt in range(2):
+            if entry is None:
+                entry = self.launch(path_, user_data_dir)
+
+            options = ChromeOptions()
+            options.debugger_address = f"127.0.0.1:{entry['port']}"
+            options.page_load_strategy = store_data.get(
+                "page_load", SETTINGS["page_load"]
+            )
+            try:
+                driver = PooledChrome(options, user_data_dir, entry)
+                driver.execute_script("return document.readyState")
+                block_urls(driver, get_blocked_urls(store_data))
+                break
+            except WebDriverException:
+                if attempt == 1:
+                    self.kill(entry)
+                    self.store.delete(user_data_dir)
+                    raise
+                self.kill(entry)
+                entry, recycled = None, True
+
+        driver.recycled = recycled
+        self.store.set(user_data_dir, dict(entry, owner=me, idle=idle))
+
+        return driver
+
+    def release(self, driver: PooledChrome) -> None:
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+        with self.store.transact():
+            entry = self.store.get(driver.user_data_dir)
+            if entry is None:
+                return
+            entry["pages"] += driver.pages
+            entry["located_for"] = driver.located_for
+            entry["last_used"] = time.time()
+            entry["owner"] = None
+            self.store.set(driver.user_data_dir, entry)
+
+    def launch(self, path_: str, user_data_dir: str) -> dict:
+        """Starts a detached headless Chrome and waits for its DevTools port"""
+        options = get_options(path_, headless=True, user_data_dir=user_data_dir)
+        directory = os.path.join(os.getcwd(), user_data_dir)
+        port_file = os.path.join(directory, "DevToolsActivePort")
+        if os.path.exists(port_file):
+            os.remove(port_file)
+
+        arguments = [x if x.startswith("--") else f"--{x}" for x in options.arguments]
+        process = subprocess.Popen(
+            [path_, *arguments, *LAUNCH_ARGUMENTS, "about:blank"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **DETACHED,
+        )
+
+        entry = {
+            "pid": process.pid,
+            "created": psutil.Process(process.pid).create_time(),
+            "port": None,
+            "started": time.time(),
+            "pages": 0,
+            "located_for": None,
+        }
+
+        deadline = time.time() + 30
+        while entry["port"] is None:
+            if time.time() > deadline or process.poll() is not None:
+                self.kill(entry)
+                raise WebDriverException("Pooled Chrome did not start")
+            try:
+                with open(port_file, "r", encoding="utf-8") as f:
+                    entry["port"] = int(f.readline())
+            except (FileNotFoundError, ValueError):
+                time.sleep(0.1)
+
+        return entry
+
+    def healthy(self, entry: dict) -> bool:
+        """The browser process is running and answers on its DevTools port"""
+        if not process_alive(entry["pid"], entry["created"]):
+            return False
+
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{entry['port']}/json/version", timeout=2
+            ) as response:
+                return response.status == 200
+        except OSError:
+            return False
+
+    def kill(self, entry: dict) -> None:
+        if entry.get("pid") is None or not process_alive(
+            entry["pid"], entry["created"]
+        ):
+            return
+
+        process = psutil.Process(entry["pid"])
+        processes = [process, *process.children(recursive=True)]
+        for x in processes:
+            try:
+                x.terminate()
+            except psutil.Error:
+                pass
+        _, alive = psutil.wait_procs(processes, timeout=5)
+        for x in alive:
+            try:
+                x.kill()
+            except psutil.Error:
+                pass
+
+    def reap(self) -> None:
+        """Shuts down the browsers unused for longer than their idle time, and
+        frees the ones leased by a scrape process that ended without releasing"""
+        for key in list(self.store):
+            with self.store.transact():
+                entry = self.store.get(key)
+                if entry is None:
+                    continue
+                if entry["owner"] is not None:
+                    if process_alive(*entry["owner"]):
+                        continue
+                    entry.update(owner=None, last_used=time.time())
+                    self.store.set(key, entry)
+                    continue
+                if time.time() - entry.get("last_used", 0) <= entry.get("idle", 0):
+                    continue
+                self.store.delete(key)
+            self.kill(entry)
+
+    def shutdown(self) -> None:
+        for key in list(self.store):
+            entry = self.store.pop(key)
+            if entry is not None:
+                self.kill(entry)
+
+    def start_reaper(self, interval: float = 30) -> None:
+        def reap() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception:
+                    pass  # retried on the next round
+
+        threading.Thread(target=reap, daemon=True).start()
+
+
+@lru_cache(maxsize=None)
+def get_driver_pool() -> DriverPool:
+    return DriverPool()
+
+
+def pool_profile(user_data_dir: str) -> str:
+    """Profile directory of the pooled browser for a scrape's profile, apart
+    from the one get_driver uses: a browser still running in it would keep
+    Chrome from starting there when the pool is disabled"""
+    name, _, suffix = user_data_dir.partition("-")
+
+    return "-".join([name, "pool", suffix]) if suffix else f"{name}-pool"
+
+
+def lease_driver(
+    path_: str, store_data: dict, user_data_dir: str = "Chrome", **fields
+) -> Chrome:
+    """A headless driver, attached to a warm pooled browser when the pool is
+    enabled. Traced as a get_driver span with `fields`"""
+    with span("get_driver", **fields) as event:
+        if not store_data.get("pool", SETTINGS["pool"]):
+            return get_driver(path_, True, user_data_dir, store_data)
+
+        driver = get_driver_pool().lease(path_, store_data, pool_profile(user_data_dir))
+        event["warm"] = driver.warm
+        event["recycled"] = driver.recycled
+
+        return driver
+
+
+def release_driver(driver: Optional[Chrome]) -> None:
+    """Returns a pooled driver's browser to the pool, quits any other driver"""
+    if isinstance(driver, PooledChrome):
+        get_driver_pool().release(driver)
+    elif driver is not None:
+        driver.quit()
@@ -0,0 +1,190 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from parsers import get_parser
+from settings import SETTINGS
+
+SELECTORS = ["name", "dv", "store1", "brand1", "price1", "price2", "price3"]
+
+
+def clean_text(text: str) -> str:
+    return text.rstrip().lower()
+
+
+def clean_price(text: str) -> str:
+    return text.split("-")[0].rstrip().lower()  # drops the "- 1 l" range suffix
+
+
+CLEANERS = {"text": clean_text, "price": clean_price}
+
+# Collects the raw card texts in the browser, walking the rules of the plan spec
+# the same way ExtractionPlan.extract_card does. Script and style contents are
+# skipped to match BeautifulSoup's text. Also returns the headline and the
+# highest linked page for the page count
+EXTRACT_CARDS_JS = """
+const spec = arguments[0];
+const text = (nodes) => {
+  let out = "";
+  for (const node of nodes) {
+    const walker = document.createTreeWalker(node, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+      if (!walker.currentNode.parentElement.closest("script, style, template")) {
+        out += walker.currentNode.data;
+      }
+    }
+  }
+  return out;
+};
+const cards = [];
+for (const li of document.querySelectorAll(spec.cards)) {
+  const name = li.querySelectorAll(spec.name);
+  if (name.length === 0) continue;
+  const card = [text(name)];
+  for (const rule of spec.rules) {
+    for (let b = 0; b < rule.length; b++) {
+      const [selector, outputs] = rule[b];
+      const nodes = li.querySelectorAll(selector);
+      if (nodes.length > 0 || b === rule.length - 1) {
+        for (const [field, own, clean] of outputs) {
+          card.push([field, clean, text(own === null ? nodes : li.querySelectorAll(own))]);
+        }
+        break;
+      }
+    }
+  }
+  cards.push(card);
+}
+const headline = document.querySelector(".headline");
+const pages = [...document.querySelectorAll("a[href*='page=']")].map(
+  (a) => Number(new URL(a.href, location.href).searchParams.get("page"))
+).filter(Number.isInteger);
+return {
+  cards: cards,
+  headline: headline === null ? null : headline.textContent,
+  lastPageLink: pages.length > 0 ? Math.max(...pages) : null,
+};
+"""
+
+
+def get_spec(selectors: dict) -> dict:
+    """The extraction rules as plain selector strings. Each rule is a list of
+    branches (selector, outputs); the first branch whose selector matches
+    anything in the card, or else the last one, writes its outputs. An output
+    is (field, own selector or None to reuse the branch's matches, cleaner)"""
+
+    def chain(field: str, selector: str) -> list:
+        # Tries the link inside the tag, the tag itself, then a span inside it
+        return [
+            [x, [[field, None, "text"]]]
+            for x in [f"{selector} > a", selector, f"{selector} > span"]
+        ]
+
+    return {
+        "cards": "li",
+        "name": selectors["name"],
+        "rules": [
+            [[selectors["dv"], [["Date valid", None, "text"]]]],
+            chain("Store", selectors["store1"]),
+            chain("Brand", selectors["brand1"]),
+            [
+                [selectors["price1"], [["Price", None, "price"]]],
+                [
+                    selectors["price2"],
+                    [["Price", None, "text"], ["Note", selectors["price3"], "text"]],
+                ],
+            ],
+        ],
+    }
+
+
+class ExtractionPlan:
+    """The store_data selectors compiled once for a parser backend"""
+
+    def __init__(self, parser, selectors: dict) -> None:
+        self.parser = parser
+        self.spec = get_spec(selectors)
+
+        c = parser.compile
+        self.cards = c(self.spec["cards"])
+        self.name = c(self.spec["name"])
+        self.rules = [
+            [
+                (
+                    c(selector),
+                    [
+                        (field, None if own is None else c(own), CLEANERS[clean])
+                        for field, own, clean in outputs
+                    ],
+                )
+                for selector, outputs in rule
+            ]
+            for rule in self.spec["rules"]
+        ]
+
+    def extract_card(
+        self, li, item: str, fallbacks: Optional[Counter] = None
+    ) -> Optional[dict]:
+        """The card's record, None when it is not an Item card. Counts the
+        fields found by a fallback selector of their rule into `fallbacks`"""
+        parser = self.parser
+
+        name = parser.select(li, self.name)
+        if len(name) == 0:
+            return None  # not an Item card
+
+        i = {"Item": item, "Name": clean_text(parser.text(name))}
+
+        for rule in self.rules:
+            for b, (selector, outputs) in enumerate(rule):
+                nodes = parser.select(li, selector)
+                if len(nodes) > 0 or b == len(rule) - 1:
+                    for field, own, clean in outputs:
+                        matches = nodes if own is None else parser.select(li, own)
+                        i[field] = clean(parser.text(matches))
+                    if b > 0 and len(nodes) > 0 and fallbacks is not None:
+                        fallbacks[outputs[0][0]] += 1
+                    break
+
+        return i
+
+    def extract(
+        self, html: str, item: str, fallbacks: Optional[Counter] = None
+    ) -> list:
+        root = self.parser.parse(html)
+
+        results = []
+        for li in self.parser.select(root, self.cards):
+            i = self.extract_card(li, item, fallbacks)
+            if i is not None:
+                results.append(i)
+
+        return results
+
+    def extract_in_browser(self, driver, item: str) -> tuple:
+        """Runs the plan in the page and returns the same records as extract,
+        transferring only the card texts instead of the page source. Also
+        returns the headline text and the highest page linked"""
+        page = driver.execute_script(EXTRACT_CARDS_JS, self.spec)
+
+        results = []
+        for card in page["cards"]:
+            i = {"Item": item, "Name": clean_text(card[0])}
+            for field, clean, text in card[1:]:
+                i[field] = CLEANERS[clean](text)
+            results.append(i)
+
+        return results, page["headline"], page["lastPageLink"]
+
+
+@lru_cache(maxsize=8)
+def _compile_plan(parser_name: str, *selectors: str) -> ExtractionPlan:
+    return ExtractionPlan(get_parser(parser_name), dict(zip(SELECTORS, selectors)))
+
+
+def compile_plan(store_data: dict) -> ExtractionPlan:
+    """Compiles the selectors once; later calls with the same settings reuse it"""
+    return _compile_plan(
+        store_data.get("parser", SETTINGS["parser"]),
+        *[store_data[x] for x in SELECTORS],
+    )
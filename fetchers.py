@@ -0,0 +1,294 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from parsers import get_parser
+from settings import SETTINGS
+from tracing import span
+
+CARDS_TIMEOUT = 120  # seconds, the longest wait for the result cards
+
+# Headline text if it is shown, number of result cards and load state, read in
+# one round trip per poll
+READY_JS = r"""
+const headline = document.querySelector(".headline");
+return [
+  headline !== null && headline.getClientRects().length > 0
+    ? headline.textContent.replace(/\s+/g, " ").trim()
+    : null,
+  document.querySelectorAll(arguments[0]).length,
+  document.readyState,
+];
+"""
+
+
+class FetchError(Exception):
+    """Raised when a fetched page does not contain the rendered search results"""
+
+
+def card_selector(store_data: dict) -> str:
+    """The names of the result cards, which tell them from menu and footer items"""
+    return f"li :is({store_data.get('name') or SETTINGS['name']})"
+
+
+def zero_total(headline: Optional[str], item: str) -> bool:
+    """The headline names the item with a total of 0 results"""
+    text = (headline or "").upper()
+    if item.upper() not in text:
+        return False
+
+    return re.search(r"\b0\b", text.replace(item.upper(), "")) is not None
+
+
+class CardsReady:
+    """Wait condition for a search page: the headline is shown and the number
+    of result cards has stopped changing. Returns the headline text as soon as
+    it doesn't name the item or has a zero total, past the last page or for an
+    item without offers, and when the loaded page stays without cards"""
+
+    def __init__(self, cards: str, item: str, stable: float = 0.3) -> None:
+        self.cards = cards
+        self.item = item.upper()
+        self.stable = stable
+        self.count = None
+        self.since = 0
+
+    def __call__(self, driver):
+        headline, count, state = driver.execute_script(READY_JS, self.cards)
+        if headline is None:
+            return False
+
+        if self.item not in headline.upper() or zero_total(headline, self.item):
+            return headline
+
+        now = time.perf_counter()
+        if count != self.count:
+            self.count, self.since = count, now
+            return False
+
+        if count == 0 and state != "complete":
+            return False
+
+        # An empty page gets longer for late cards than a page settling
+        stable = self.stable if count > 0 else 4 * self.stable
+        return headline if now - self.since >= stable else False
+
+
+class ReadyTimes:
+    """How long recent pages took to get ready, to give up on a stuck page
+    well before CARDS_TIMEOUT once the site's usual speed is known"""
+
+    def __init__(self, size: int = 50, min_samples: int = 5) -> None:
+        self.times = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self.lock:
+            self.times.append(seconds)
+
+    def timeout(self) -> float:
+        with self.lock:
+            times = sorted(self.times)
+
+        if len(times) < self.min_samples:
+            return CARDS_TIMEOUT
+
+        slow = times[int(0.95 * (len(times) - 1))]
+
+        return min(CARDS_TIMEOUT, max(10, 4 * slow))
+
+
+ready_times = ReadyTimes()  # shared by the fetchers of all drivers
+
+
+def get_element_text(html: str, class_name: str) -> Optional[str]:
+    """Text of the first element with the class, without parsing the whole page"""
+    match = re.search(
+        rf"""<(\w+)[^>]*\bclass=["'][^"']*\b{class_name}\b[^"']*["'][^>]*>(.*?)</\1>""",
+        html,
+        re.DOTALL,
+    )
+    if match is None:
+        return None
+
+    return re.sub(r"<[^>]+>", "", match.group(2)).strip()
+
+
+class SeleniumFetcher:
+    """Loads pages in a Chrome driver and returns the rendered page source"""
+
+    def __init__(self, driver, cards: Optional[str] = None) -> None:
+        self.driver = driver
+        self.cards = cards or card_selector({})
+        self.lock = threading.Lock()  # a driver can only load one page at a time
+
+    def load(self, url: str, item: str, zip_: str) -> None:
+        driver = self.driver
+
+        with span("get"):
+            driver.get(url)
+
+        # Waits until the Item cards are loaded - affects the results
+        # ---------------------------
+        with span("wait"):
+            timeout = ready_times.timeout()
+            started = time.perf_counter()
+            try:
+                headline = WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+                    CardsReady(self.cards, item)
+                )
+                ready_times.add(time.perf_counter() - started)
+            except TimeoutException:
+                if timeout >= CARDS_TIMEOUT:
+                    raise
+                driver.refresh()  # slower than the site has been, likely stuck
+                headline = WebDriverWait(
+                    driver, CARDS_TIMEOUT, poll_frequency=0.1
+                ).until(CardsReady(self.cards, item))
+
+        # Exit condition: last page found, continues with the next item
+        # ---------------------------
+        assert item.upper() in headline.upper()
+
+    def fetch(self, url: str, item: str, zip_: str) -> str:
+        with self.lock:
+            self.load(url, item, zip_)
+
+            return self.driver.page_source
+
+    def extract(self, url: str, item: str, zip_: str, plan) -> tuple:
+        """Runs the extraction plan in the browser instead of returning the page"""
+        with self.lock:
+            self.load(url, item, zip_)
+
+            with span("extract"):
+                return plan.extract_in_browser(self.driver, item)
+
+
+class HttpFetcher:
+    """Fetches server-rendered pages over pooled keep-alive connections.
+    Responses that don't contain the results for the location raise FetchError"""
+
+    def __init__(
+        self,
+        cookies: Optional[list] = None,
+        user_agent: Optional[str] = None,
+        max_connections: int = 4,
+        timeout: int = 15,
+        cards: Optional[str] = None,
+        parser=None,
+    ) -> None:
+        self.timeout = timeout
+        self.parser = parser or get_parser()
+        self.cards = self.parser.compile(cards or card_selector({}))
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if user_agent:
+            self.session.headers["User-Agent"] = user_agent
+        for cookie in cookies or []:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+            )
+
+    @classmethod
+    def from_driver(cls, driver, **kwargs) -> "HttpFetcher":
+        """Copies the location cookies and user agent of a located driver"""
+        return cls(
+            cookies=driver.get_cookies(),
+            user_agent=driver.execute_script("return navigator.userAgent;"),
+            **kwargs,
+        )
+
+    def fetch(self, url: str, item: str, zip_: str) -> str:
+        try:
+            with self.semaphore, span("get"):
+                response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise FetchError(e) from e
+
+        html = response.text
+
+        # Content check: a JS-only shell has no headline or no result cards, a
+        # wrong session shows another location
+        headline = get_element_text(html, "headline")
+        if headline is None:
+            raise FetchError(f"No headline in {url}")
+        location_text = get_element_text(html, "location-text")
+        if location_text is None or zip_ not in location_text:
+            raise FetchError(f"Location not set in {url}")
+
+        assert item.upper() in headline.upper()
+
+        if not zero_total(headline, item) and not self.has_cards(html):
+            raise FetchError(f"No result cards in {url}")
+
+        return html
+
+    def has_cards(self, html: str) -> bool:
+        return len(self.parser.select(self.parser.parse(html), self.cards)) > 0
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class FallbackFetcher:
+    """Tries the fast fetcher first and falls back to the next one when the
+    response fails the content check. Gives up on the fast fetcher after
+    several failures in a row"""
+
+    def __init__(self, fetcher, fallback, max_failures: int = 3) -> None:
+        self.fetcher = fetcher
+        self.fallback = fallback
+        self.max_failures = max_failures
+        self.failures = 0
+
+    def fetch(self, url: str, item: str, zip_: str) -> str:
+        if self.failures < self.max_failures:
+            try:
+                html = self.fetcher.fetch(url, item, zip_)
+                self.failures = 0
+
+                return html
+            except FetchError:
+                self.failures += 1
+
+        return self.fallback.fetch(url, item, zip_)
+
+
+def get_http_fetcher(driver, store_data: dict) -> Optional[HttpFetcher]:
+    if store_data.get("fetcher") != "http":
+        return None
+
+    concurrency = int(store_data.get("concurrency") or SETTINGS["concurrency"])
+
+    return HttpFetcher.from_driver(
+        driver,
+        max_connections=concurrency,
+        cards=card_selector(store_data),
+        parser=get_parser(store_data.get("parser", SETTINGS["parser"])),
+    )
+
+
+def get_fetcher(driver, store_data: dict, http_fetcher: Optional[HttpFetcher] = None):
+    fetcher = SeleniumFetcher(driver, card_selector(store_data))
+    if http_fetcher is None:
+        return fetcher
+
+    return FallbackFetcher(http_fetcher, fetcher)
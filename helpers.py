@@ -8,6 +8,7 @@ import pandas as pd
 import requests
 from dash import html
 
+from matching import match_scores
 from settings import SETTINGS
 
 
@@ -27,19 +28,14 @@ def write_settings(data: dict) -> None:
         print(e)
 
 
-def rank_similarity(df: pd.DataFrame) -> pd.DataFrame:
-    unfiltered_df = df.copy()
+def rank_similarity(
+    df: pd.DataFrame, threshold: float = SETTINGS["filter_threshold"]
+) -> pd.DataFrame:
+    """Keeps the offers whose name matches the searched item with a score of at
+    least `threshold`, grouped by item"""
+    filtered_df = df[match_scores(df["Item"], df["Name"]) >= threshold]
 
-    grouped_unfiltered_df = unfiltered_df.groupby(["Item"])
-
-    groups = []
-    for name, group in grouped_unfiltered_df:
-        gdf = group[group["Name"].str.endswith(name)]
-        groups.append(gdf)
-
-    filtered_df = pd.concat(groups)
-
-    return filtered_df
+    return filtered_df.sort_values("Item", kind="stable")
 
 
 def get_chrome_version(path: str) -> str:
@@ -94,16 +90,20 @@ def write_txt_file(file: str, txt: str) -> None:
         print(e)
 
 
-def read_list(input_: str) -> list:
+def read_list(input_: str, lower: bool = True) -> list:
     return [
-        line.rstrip().lower()
+        line.rstrip().lower() if lower else line.rstrip()
         for line in input_.splitlines()
         if not line.startswith("#") and not line.rstrip() == ""
     ]  # strips spaces and new lines
 
 
 def get_alert(
-    text: str, color: str, traceback: bool = False, traceback_text: str = ""
+    text: str,
+    color: str,
+    traceback: bool = False,
+    traceback_text: str = "",
+    details=None,
 ) -> dbc.Alert:
     if traceback:
         alert = dbc.Alert(
@@ -128,6 +128,13 @@ def get_alert(
             is_open=True,
             dismissable=True,
         )
+    elif details is not None:
+        alert = dbc.Alert(
+            [str(text), html.Hr(), details],
+            color=color,
+            is_open=True,
+            dismissable=True,
+        )
     else:
         if color in ["danger", "warning"]:
             alert = dbc.Alert(
@@ -0,0 +1,223 @@
+import itertools
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Iterable, Iterator, Optional
+
+import pandas as pd
+
+from page_cache import selector_hash
+from settings import SETTINGS
+
+HISTORY_DB = "history.sqlite"
+CHUNK_SIZE = 500  # records held before they are written
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    zip TEXT NOT NULL,
+    fetched REAL NOT NULL,
+    selector_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    item TEXT NOT NULL,
+    store TEXT,
+    day TEXT NOT NULL,
+    name TEXT,
+    brand TEXT,
+    price REAL,
+    unit TEXT,
+    date_valid TEXT,
+    note TEXT,
+    price_text TEXT
+);
+CREATE INDEX IF NOT EXISTS records_item_store_day ON records (item, store, day);
+CREATE INDEX IF NOT EXISTS records_item_day_price ON records (item, day, price);
+"""
+
+COLUMNS = {
+    "Item": "item",
+    "Store": "store",
+    "Name": "name",
+    "Brand": "brand",
+    "Date valid": "date_valid",
+    "Note": "note",
+    "Price": "price_text",
+}
+
+
+def split_prices(prices: pd.Series) -> tuple:
+    """Price and unit of texts such as "€ 1,99/1 kg". Unlike generate_output a
+    price without a number is kept as NULL instead of failing the run"""
+    parts = prices.fillna("").str.partition("/")
+    numbers = parts[0].str.extract(r"^[^ ]* ([^ ]*)", expand=False)
+
+    return (
+        pd.to_numeric(numbers.str.replace(",", ".", regex=False), errors="coerce"),
+        parts[2].replace("", None),
+    )
+
+
+def chunks(records: Iterable[dict], size: int) -> Iterator[list]:
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+class PriceHistory:
+    """Records of every run in a SQLite database, indexed by item, store and
+    day, with queries over the price history. A temporary database is removed
+    when it is closed"""
+
+    def __init__(self, path: str = HISTORY_DB, temporary: bool = False) -> None:
+        self.path = path
+        self.temporary = temporary
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+
+        # Databases from before the scraped price text was kept
+        columns = [x[1] for x in self.connection.execute("PRAGMA table_info(records)")]
+        if "price_text" not in columns:
+            with self.connection:
+                self.connection.execute(
+                    "ALTER TABLE records ADD COLUMN price_text TEXT"
+                )
+
+    def add_run(
+        self,
+        records: Iterable[dict],
+        zip_: str,
+        store_data: dict,
+        fetched: Optional[float] = None,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> int:
+        """Appends the records of a run and returns the run id. The records are
+        consumed and written `chunk_size` at a time, so a scrape streamed in is
+        never held whole; if it fails the partly written run is removed"""
+        fetched = time.time() if fetched is None else fetched
+
+        with self.connection:
+            run_id = self.connection.execute(
+                "INSERT INTO runs (zip, fetched, selector_hash) VALUES (?, ?, ?)",
+                (zip_, fetched, selector_hash(store_data)),
+            ).lastrowid
+
+        try:
+            for chunk in chunks(records, chunk_size):
+                with self.connection:
+                    self.add_records(run_id, chunk, fetched)
+        except Exception:
+            with self.connection:
+                self.connection.execute(
+                    "DELETE FROM records WHERE run_id = ?", (run_id,)
+                )
+                self.connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            raise
+
+        return run_id
+
+    def add_records(self, run_id: int, records: list, fetched: float) -> None:
+        df = pd.DataFrame(records)
+
+        rows = pd.DataFrame(
+            {
+                column: df[field] if field in df else None
+                for field, column in COLUMNS.items()
+            }
+        )
+        rows["price"], rows["unit"] = split_prices(df["Price"])
+        rows["run_id"] = run_id
+        rows["day"] = date.fromtimestamp(fetched).isoformat()
+
+        rows = rows.astype(object).where(rows.notna(), None)
+        self.connection.executemany(
+            f"INSERT INTO records ({', '.join(rows.columns)}) "
+            f"VALUES ({', '.join(['?'] * len(rows.columns))})",
+            rows.itertuples(index=False, name=None),
+        )
+
+    def run_records(self, run_id: int) -> pd.DataFrame:
+        """The records of a run with the scraper's fields, in scraping order,
+        read back in one query for generate_output. Fields no record had are
+        left out, as in a frame built from the records"""
+        fields = ", ".join(
+            f'{column} AS "{field}"' for field, column in COLUMNS.items()
+        )
+        df = pd.read_sql_query(
+            f"SELECT {fields} FROM records WHERE run_id = ? ORDER BY rowid",
+            self.connection,
+            params=[run_id],
+        )
+
+        return df.dropna(axis=1, how="all")
+
+    def price_history(self, item: str, store: Optional[str] = None) -> pd.DataFrame:
+        """Every recorded offer for the item, at one store or all of them, oldest
+        first"""
+        query = """
+            SELECT day, store, name, brand, price, unit, date_valid
+            FROM records WHERE item = ?
+        """
+        params = [item]
+        if store is not None:
+            query += " AND store = ?"
+            params.append(store)
+
+        return pd.read_sql_query(
+            query + " ORDER BY day, store", self.connection, params=params
+        )
+
+    def cheapest(
+        self, item: str, weeks: int = 4, store: Optional[str] = None, limit: int = 1
+    ) -> pd.DataFrame:
+        """The lowest priced offers for the item seen in the last `weeks` weeks"""
+        since = (date.today() - timedelta(weeks=weeks)).isoformat()
+
+        query = """
+            SELECT day, store, name, brand, price, unit, date_valid
+            FROM records WHERE item = ? AND day >= ? AND price IS NOT NULL
+        """
+        params = [item, since]
+        if store is not None:
+            query += " AND store = ?"
+            params.append(store)
+
+        return pd.read_sql_query(
+            query + " ORDER BY price LIMIT ?",
+            self.connection,
+            params=[*params, limit],
+        )
+
+    def runs(self) -> pd.DataFrame:
+        return pd.read_sql_query("SELECT * FROM runs ORDER BY fetched", self.connection)
+
+    def close(self) -> None:
+        self.connection.close()
+        if self.temporary:
+            os.remove(self.path)
+
+
+def get_price_history(store_data: dict) -> Optional[PriceHistory]:
+    if not store_data.get("history", SETTINGS["history"]):
+        return None
+
+    return PriceHistory()
+
+
+def get_run_sink(store_data: dict) -> PriceHistory:
+    """The database a run's records are streamed into: the price history, or a
+    temporary one when the history is disabled"""
+    history = get_price_history(store_data)
+    if history is not None:
+        return history
+
+    handle, path = tempfile.mkstemp(suffix=".sqlite")
+    os.close(handle)
+
+    return PriceHistory(path, temporary=True)
@@ -0,0 +1,153 @@
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+from datetime import date
+from typing import Iterable, Iterator, Optional
+
+import diskcache
+
+from page_cache import selector_hash
+from settings import SETTINGS
+
+RUNS_DIR = "runs"
+
+
+def valid_until(date_valid: str, fetched: date) -> Optional[date]:
+    """Last day of a "Date valid" text such as "22.12. - 25.12.". Dates without a
+    year fall in the year of the fetch, or the next one when they wrap around"""
+    dates = re.findall(r"(\d{1,2})\.(\d{1,2})\.(\d{4}|\d{2})?", date_valid)
+    if len(dates) == 0:
+        return None
+
+    day, month, year = dates[-1]
+    try:
+        if year:
+            return date(
+                int(year) + (2000 if len(year) == 2 else 0), int(month), int(day)
+            )
+
+        end = date(fetched.year, int(month), int(day))
+        if (fetched - end).days > 180:
+            end = date(fetched.year + 1, int(month), int(day))
+    except ValueError:
+        return None
+
+    return end
+
+
+def fingerprint(records: list) -> str:
+    return hashlib.sha1(json.dumps(records, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RunStore:
+    """Records of previous runs per (ZIP code, selectors, item). Items whose
+    offers are all still valid and were fetched within `max_age` seconds are
+    reused as they are; the others are checked against their first page, and
+    reused when it has not changed"""
+
+    def __init__(
+        self, store_data: dict, zip_: str, max_age: int, directory: str = RUNS_DIR
+    ) -> None:
+        self.cache = diskcache.Cache(directory)
+        self.prefix = (zip_, selector_hash(store_data))
+        self.max_age = max_age
+
+        self.first_pages = {}
+        self.unchanged = set()
+        self.lock = threading.Lock()
+
+    def get(self, item: str) -> Optional[dict]:
+        return self.cache.get((*self.prefix, item))
+
+    def is_fresh(self, run: dict) -> bool:
+        if time.time() - run["fetched"] > self.max_age:
+            return False
+
+        fetched = date.fromtimestamp(run["fetched"])
+        for i in run["records"]:
+            end = valid_until(i.get("Date valid", ""), fetched)
+            if end is None or end < date.today():
+                return False
+
+        return True
+
+    def split(self, shopping_list: list) -> tuple:
+        """Returns the items to scrape and the reused records of the others"""
+        to_scrape = []
+        reused = {}
+        for item in shopping_list:
+            run = self.get(item)
+            if run is not None and self.is_fresh(run):
+                reused[item] = run["records"]
+            else:
+                to_scrape.append(item)
+
+        return to_scrape, reused
+
+    def check_first_page(self, item: str, records: list) -> bool:
+        """True when the first page matches the previous run's, so the item's
+        other pages don't need to be fetched"""
+        run = self.get(item)
+        with self.lock:
+            self.first_pages[item] = fingerprint(records)
+            if run is not None and run["first_page"] == self.first_pages[item]:
+                self.unchanged.add(item)
+                return True
+
+        return False
+
+    def merge(
+        self, shopping_list: list, records: Iterable[dict], reused: dict
+    ) -> Iterator[dict]:
+        """Merges reused and scraped records in shopping list order and saves the
+        scraped ones for the next run. `records` come grouped by item in shopping
+        list order, as the engines produce them, and are consumed one item at a
+        time"""
+        groups = itertools.groupby(records, key=lambda i: i["Item"])
+        group = next(groups, None)
+
+        for item in shopping_list:
+            if item in reused:
+                yield from reused[item]
+                continue
+
+            scraped = []
+            if group is not None and group[0] == item:
+                scraped = list(group[1])
+                group = next(groups, None)
+
+            if item in self.unchanged:
+                scraped = self.get(item)["records"]
+                self.save(item, scraped)
+            elif item in self.first_pages:
+                self.save(item, scraped)
+
+            yield from scraped
+
+    def save(self, item: str, records: list) -> None:
+        self.cache.set(
+            (*self.prefix, item),
+            {
+                "fetched": time.time(),
+                "records": records,
+                "first_page": self.first_pages[item],
+            },
+        )
+
+    def summary(self, reused: dict) -> str:
+        return f"{len(reused)} items reused, {len(self.unchanged)} unchanged"
+
+    def close(self) -> None:
+        self.cache.close()
+
+
+def get_run_store(store_data: dict, zip_: str) -> Optional[RunStore]:
+    if not store_data.get("incremental", SETTINGS["incremental"]):
+        return None
+
+    max_age = float(store_data.get("incremental_age") or SETTINGS["incremental_age"])
+
+    return RunStore(store_data, zip_, max_age=int(max_age * 60 * 60))
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+from typing import Optional
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+SEARCH_URL = "https://www.marktguru.de/search"
+SESSIONS_DIR = "sessions"
+SESSION_TTL = 12 * 60 * 60  # seconds
+
+
+def get_session_path(zip_: str) -> str:
+    return os.path.join(SESSIONS_DIR, f"{zip_}.json")
+
+
+def save_location_session(driver, zip_: str) -> None:
+    """Saves the cookies and localStorage of a located session"""
+    session = {
+        "saved": time.time(),
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script(
+            "return Object.assign({}, window.localStorage);"
+        ),
+    }
+
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    with open(get_session_path(zip_), "w", encoding="utf-8") as f:
+        json.dump(session, f)
+
+
+def load_location_session(zip_: str, ttl: int = SESSION_TTL) -> Optional[dict]:
+    """Returns the saved session for the ZIP code unless it is missing or stale"""
+    try:
+        with open(get_session_path(zip_), "r", encoding="utf-8") as f:
+            session = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if time.time() - session.get("saved", 0) > ttl:
+        os.remove(get_session_path(zip_))
+        return None
+
+    return session
+
+
+def restore_location_session(
+    driver,
+    first_item: str,
+    zip_: str,
+    ttl: int = SESSION_TTL,
+    timeout: int = 15,
+    url: str = SEARCH_URL,
+) -> bool:
+    """Injects a saved session into the driver and checks that the location
+    text shows the ZIP code"""
+    session = load_location_session(zip_, ttl)
+    if session is None:
+        return False
+
+    # Cookies and localStorage can only be set on the site's own origin
+    driver.get(url.rsplit("/", 1)[0] + "/")
+
+    for cookie in session["cookies"]:
+        try:
+            driver.add_cookie(cookie)
+        except WebDriverException:
+            pass  # expired or rejected cookie
+
+    driver.execute_script(
+        "for (const [k, v] of Object.entries(arguments[0])) window.localStorage.setItem(k, v);",
+        session["local_storage"],
+    )
+
+    driver.get(f"{url}/{first_item}?title={first_item}&page=0")
+
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.text_to_be_present_in_element((By.CLASS_NAME, "location-text"), zip_)
+        )
+    except TimeoutException:
+        return False
+
+    return True
@@ -1,3 +1,4 @@
+import glob
 import logging
 import os
 import shutil
@@ -9,6 +10,7 @@ import dash_bootstrap_components as dbc
 import diskcache
 from dash import Dash, Input, Output, State, callback, ctx, dcc, html, no_update
 from dash.long_callback import DiskcacheLongCallbackManager
+from flask import Response
 from selenium.common.exceptions import (
     ElementNotInteractableException,
     SessionNotCreatedException,
@@ -16,9 +18,12 @@ from selenium.common.exceptions import (
 )
 from soupsieve.util import SelectorSyntaxError
 
+import metrics
 import native_web_app
+from async_engine import launch_scraper_async
 from components.main import main
 from components.sidebar import sidebar
+from driver_pool import get_driver_pool, lease_driver, release_driver
 from helpers import (
     check_chrome_exe_path,
     download_chromedriver,
@@ -28,9 +33,19 @@ from helpers import (
     read_list,
     write_txt_file,
 )
-from marktguru_scraper import generate_output, launch_scraper, set_location
-from selenium_init import ChromeBinaryNotFound, get_driver
+from history import get_run_sink
+from incremental import get_run_store
+from marktguru_scraper import (
+    ensure_location,
+    format_timings,
+    generate_output,
+    iter_scraper,
+    launch_scraper_pool,
+)
+from page_cache import get_page_cache
+from selenium_init import ChromeBinaryNotFound
 from settings import SETTINGS
+from tracing import get_trace, span, start_trace, stop_trace
 
 
 def launch_app() -> None:
@@ -51,6 +66,10 @@ def App(long_callback_manager) -> None:
 
     app.layout = html.Div([dcc.Location(id="url"), sidebar, page])
 
+    @app.server.route("/metrics")
+    def serve_metrics():
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
     # ---------------------------------------------------------------------------------
     @callback(
         Output("modal-centered", "is_open"),
@@ -79,6 +98,29 @@ def App(long_callback_manager) -> None:
         Output("price-input-3", "value"),
         #
         Output("filter", "value"),
+        Output("filter-threshold-input", "value"),
+        #
+        Output("workers-input", "value"),
+        Output("fetcher-input", "value"),
+        Output("parser-input", "value"),
+        Output("extraction-input", "value"),
+        Output("engine-input", "value"),
+        Output("concurrency-input", "value"),
+        Output("rate-input", "value"),
+        Output("cache-ttl-input", "value"),
+        Output("cache-size-input", "value"),
+        Output("incremental-input", "value"),
+        Output("incremental-age-input", "value"),
+        Output("output-formats-input", "value"),
+        Output("history-input", "value"),
+        Output("tracing-input", "value"),
+        Output("pool-input", "value"),
+        Output("pool-max-age-input", "value"),
+        Output("pool-max-pages-input", "value"),
+        Output("pool-idle-input", "value"),
+        Output("lean-pages-input", "value"),
+        Output("blocked-urls-input", "value"),
+        Output("page-load-input", "value"),
         #
         Input("store", "modified_timestamp"),
         State("store", "data"),
@@ -101,6 +143,29 @@ def App(long_callback_manager) -> None:
             data.get("price3"),
             #
             data.get("filter"),
+            data.get("filter_threshold", SETTINGS["filter_threshold"]),
+            #
+            data.get("workers", SETTINGS["workers"]),
+            data.get("fetcher", SETTINGS["fetcher"]),
+            data.get("parser", SETTINGS["parser"]),
+            data.get("extraction", SETTINGS["extraction"]),
+            data.get("engine", SETTINGS["engine"]),
+            data.get("concurrency", SETTINGS["concurrency"]),
+            data.get("rate", SETTINGS["rate"]),
+            data.get("cache_ttl", SETTINGS["cache_ttl"]),
+            data.get("cache_size", SETTINGS["cache_size"]),
+            data.get("incremental", SETTINGS["incremental"]),
+            data.get("incremental_age", SETTINGS["incremental_age"]),
+            data.get("output_formats", SETTINGS["output_formats"]),
+            data.get("history", SETTINGS["history"]),
+            data.get("tracing", SETTINGS["tracing"]),
+            data.get("pool", SETTINGS["pool"]),
+            data.get("pool_max_age", SETTINGS["pool_max_age"]),
+            data.get("pool_max_pages", SETTINGS["pool_max_pages"]),
+            data.get("pool_idle", SETTINGS["pool_idle"]),
+            data.get("lean_pages", SETTINGS["lean_pages"]),
+            "\n".join(data.get("blocked_urls", SETTINGS["blocked_urls"])),
+            data.get("page_load", SETTINGS["page_load"]),
         )
 
     # ---------------------------
@@ -126,6 +191,29 @@ def App(long_callback_manager) -> None:
         State("store", "data"),
         #
         State("filter", "value"),
+        State("filter-threshold-input", "value"),
+        #
+        State("workers-input", "value"),
+        State("fetcher-input", "value"),
+        State("parser-input", "value"),
+        State("extraction-input", "value"),
+        State("engine-input", "value"),
+        State("concurrency-input", "value"),
+        State("rate-input", "value"),
+        State("cache-ttl-input", "value"),
+        State("cache-size-input", "value"),
+        State("incremental-input", "value"),
+        State("incremental-age-input", "value"),
+        State("output-formats-input", "value"),
+        State("history-input", "value"),
+        State("tracing-input", "value"),
+        State("pool-input", "value"),
+        State("pool-max-age-input", "value"),
+        State("pool-max-pages-input", "value"),
+        State("pool-idle-input", "value"),
+        State("lean-pages-input", "value"),
+        State("blocked-urls-input", "value"),
+        State("page-load-input", "value"),
         #
         # prevent_initial_call=True,  # on load
     )
@@ -148,6 +236,29 @@ def App(long_callback_manager) -> None:
         store_data,
         #
         filter,
+        filter_threshold,
+        #
+        workers,
+        fetcher,
+        parser,
+        extraction,
+        engine,
+        concurrency,
+        rate,
+        cache_ttl,
+        cache_size,
+        incremental,
+        incremental_age,
+        output_formats,
+        history,
+        tracing,
+        pool,
+        pool_max_age,
+        pool_max_pages,
+        pool_idle,
+        lean_pages,
+        blocked_urls,
+        page_load,
     ):
         store_data = {}
 
@@ -167,6 +278,48 @@ def App(long_callback_manager) -> None:
             store_data["filter"] = filter
         else:
             store_data["filter"] = SETTINGS["filter"]
+        store_data["filter_threshold"] = (
+            filter_threshold
+            if filter_threshold is not None
+            else SETTINGS["filter_threshold"]
+        )
+        #
+        store_data["workers"] = workers or SETTINGS["workers"]
+        store_data["fetcher"] = fetcher or SETTINGS["fetcher"]
+        store_data["parser"] = parser or SETTINGS["parser"]
+        store_data["extraction"] = extraction or SETTINGS["extraction"]
+        store_data["engine"] = engine or SETTINGS["engine"]
+        store_data["concurrency"] = concurrency or SETTINGS["concurrency"]
+        if rate != None:
+            store_data["rate"] = rate
+        else:
+            store_data["rate"] = SETTINGS["rate"]
+        if cache_ttl != None:
+            store_data["cache_ttl"] = cache_ttl
+        else:
+            store_data["cache_ttl"] = SETTINGS["cache_ttl"]
+        store_data["cache_size"] = cache_size or SETTINGS["cache_size"]
+        if incremental != None:
+            store_data["incremental"] = incremental
+        else:
+            store_data["incremental"] = SETTINGS["incremental"]
+        store_data["incremental_age"] = incremental_age or SETTINGS["incremental_age"]
+        store_data["output_formats"] = output_formats or SETTINGS["output_formats"]
+        store_data["history"] = bool(history)
+        store_data["tracing"] = bool(tracing)
+        store_data["pool"] = bool(pool)
+        store_data["pool_max_age"] = pool_max_age or SETTINGS["pool_max_age"]
+        store_data["pool_max_pages"] = pool_max_pages or SETTINGS["pool_max_pages"]
+        store_data["pool_idle"] = pool_idle or SETTINGS["pool_idle"]
+        if lean_pages != None:
+            store_data["lean_pages"] = lean_pages
+        else:
+            store_data["lean_pages"] = SETTINGS["lean_pages"]
+        if blocked_urls != None:
+            store_data["blocked_urls"] = read_list(blocked_urls, lower=False)
+        else:
+            store_data["blocked_urls"] = SETTINGS["blocked_urls"]
+        store_data["page_load"] = page_load or SETTINGS["page_load"]
 
         # print(store_data)
 
@@ -237,6 +390,7 @@ def App(long_callback_manager) -> None:
             State("shopping-list", "value"),
             State("item-blacklist", "value"),
             State("store", "data"),
+            State("refresh-checkbox", "value"),
         ],
         running=[
             (Output("scrape-button", "disabled"), True, False),
@@ -269,14 +423,17 @@ def App(long_callback_manager) -> None:
         shopping_list,
         item_blacklist,
         store_data,
+        refresh,
     ):
         if n_clicks:
+            started = time.perf_counter()
+            outcome = "error"
             try:
                 write_txt_file("shopping_list", shopping_list)
                 write_txt_file("item_blacklist", item_blacklist)
 
                 sl = read_list(shopping_list)
-                ib = read_list(item_blacklist)
+                ib = read_list(item_blacklist, lower=False)  # keeps regex case
 
                 if len(sl) == 0:
                     return (
@@ -285,8 +442,10 @@ def App(long_callback_manager) -> None:
                         no_update,
                     )
 
+                trace = start_trace(store_data)
+
                 try:
-                    driver = get_driver(path_, headless=True)
+                    driver = lease_driver(path_, store_data)
                     assert driver is not None
                 except ChromeBinaryNotFound as e:
                     set_progress(("...", "", "", 100, no_update))
@@ -311,37 +470,120 @@ def App(long_callback_manager) -> None:
                     download_chromedriver(version)
                     set_progress(("...", "", "", 100, no_update))
 
-                    driver = get_driver(path_, headless=True)
+                    driver = lease_driver(path_, store_data, downloaded_driver=True)
 
                 # ---------------------------
                 set_progress(("Setting location", "", "", 10))
+                timings = {}
                 try:
-                    set_location(driver, sl[0], zip_)
+                    with span("set_location"):
+                        timings = ensure_location(driver, sl[0], zip_, url)
                 except ElementNotInteractableException:
                     pass
-                set_progress(("Location set", "", "", 20))
-
-                time.sleep(1)
+                set_progress(("Location set", ": ", format_timings(timings), 20))
 
                 # ---------------------------
                 set_progress(("Scraping", "", "", 40))
-                data = launch_scraper(driver, url, sl, zip_, store_data, set_progress)
-                set_progress(("Done scraping", "", "", 80))
+                cache = get_page_cache(store_data, zip_, bool(refresh))
+
+                # Incremental mode skips items whose offers are still valid
+                runs = get_run_store(store_data, zip_)
+                to_scrape, reused = sl, {}
+                if runs is not None:
+                    to_scrape, reused = runs.split(sl)
+
+                workers = int(store_data.get("workers") or SETTINGS["workers"])
+                if len(to_scrape) == 0:
+                    data = []  # every item reused
+                elif store_data.get("engine") == "asyncio":
+                    data = launch_scraper_async(
+                        driver,
+                        url,
+                        to_scrape,
+                        zip_,
+                        store_data,
+                        set_progress,
+                        cache,
+                        runs,
+                    )
+                elif workers > 1:
+                    data = launch_scraper_pool(
+                        driver,
+                        path_,
+                        url,
+                        to_scrape,
+                        zip_,
+                        store_data,
+                        set_progress,
+                        workers,
+                        cache,
+                        runs,
+                    )
+                else:
+                    # Records are streamed through the incremental merge
+                    data = iter_scraper(
+                        driver,
+                        url,
+                        to_scrape,
+                        zip_,
+                        store_data,
+                        set_progress,
+                        cache,
+                        runs,
+                    )
 
-                time.sleep(1)
+                if runs is not None:
+                    data = runs.merge(sl, data, reused)
+
+                # Records are written in chunks as they are scraped, to the price
+                # history or a temporary database, and read back for the output
+                sink = get_run_sink(store_data)
+                try:
+                    run_id = sink.add_run(data, zip_, store_data)
+                    data = sink.run_records(run_id)
+                finally:
+                    sink.close()
+
+                summary = []
+                if cache is not None:
+                    metrics.inc("marktguru_cache_hits_total", cache.hits)
+                    metrics.inc("marktguru_cache_misses_total", cache.misses)
+                    summary.append(cache.summary())
+                    cache.close()
+                if runs is not None:
+                    summary.append(runs.summary(reused))
+                    runs.close()
+                set_progress(("Done scraping", ": ", ", ".join(summary), 80))
 
                 # ---------------------------
                 set_progress(("Processing data", "", "", 90))
-                file = generate_output(data, lp, ib, store_data["filter"])
-                set_progress(("Writing Excel file", "", "", 95))
-
-                time.sleep(1)
+                with span("generate_output", records=len(data)):
+                    file = generate_output(
+                        data,
+                        lp,
+                        ib,
+                        store_data["filter"],
+                        store_data.get("output_formats", SETTINGS["output_formats"]),
+                        float(
+                            store_data.get(
+                                "filter_threshold", SETTINGS["filter_threshold"]
+                            )
+                        ),
+                    )
+                set_progress(("Writing output files", "", "", 95))
 
                 # ---------------------------
                 set_progress(("...", "", "", 100))
 
+                details = None
+                if trace is not None:
+                    details = dbc.Table.from_dataframe(
+                        trace.summary(), size="sm", striped=True
+                    )
+
+                outcome = "success"
                 return (
-                    get_alert("Scraping successful", "success"),
+                    get_alert("Scraping successful", "success", details=details),
                     {"visibility": "visible"},
                     file,
                 )
@@ -368,7 +610,7 @@ def App(long_callback_manager) -> None:
                     no_update,
                 )
             except ProcessLookupError:
-                pass
+                outcome = "cancelled"
             except Exception as e:
                 set_progress(("...", "", "", 100, no_update))
 
@@ -396,10 +638,19 @@ def App(long_callback_manager) -> None:
                 )
             finally:
                 try:
-                    driver.quit()
+                    release_driver(driver)
                 except:
                     set_progress(("...", "", "", 100, no_update))
 
+                if get_trace() is not None:
+                    get_trace().save()
+                    stop_trace()
+
+                metrics.inc("marktguru_runs_total", outcome=outcome)
+                metrics.observe(
+                    "marktguru_run_duration_seconds", time.perf_counter() - started
+                )
+
     @callback(Output("page-content", "children"), [Input("url", "pathname")])
     def output_page_content(pathname):
         return main
@@ -409,17 +660,23 @@ def App(long_callback_manager) -> None:
 
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
 
+    get_driver_pool().start_reaper()
+
     app.run_server(debug=False)  # debug=True, use_reloader=False
 
+    get_driver_pool().shutdown()
+
     print()
 
 
 if __name__ == "__main__":
-    try:
-        shutil.rmtree("cache")
-        shutil.rmtree("Chrome")
-    except (PermissionError, FileNotFoundError):
-        pass
+    get_driver_pool().shutdown()  # browsers left by an app that didn't exit cleanly
+
+    for folder in ["cache", "metrics", "Chrome", *glob.glob("Chrome-*")]:
+        try:
+            shutil.rmtree(folder)
+        except (PermissionError, FileNotFoundError):
+            pass
 
     cache = diskcache.Cache("./cache")
     long_callback_manager = DiskcacheLongCallbackManager(cache)
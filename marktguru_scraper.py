@@ -1,158 +1,340 @@
+import math
+import queue
 import random
+import re
+import sqlite3
 import string
+import threading
 import time
 import warnings
+from collections import Counter
+from contextlib import closing
 from datetime import date
+from typing import Iterator, NamedTuple, Optional
 
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    TimeoutException,
+)
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from blacklist import compile_blacklist
+from driver_pool import lease_driver, release_driver
+from extraction import compile_plan
+from fetchers import (
+    SeleniumFetcher,
+    card_selector,
+    get_element_text,
+    get_fetcher,
+    get_http_fetcher,
+    zero_total,
+)
 from helpers import rank_similarity
-
-
-def set_location(driver, first_item: str, zip_: str):
-    driver.get(
-        f"https://www.marktguru.de/search/{first_item}?title={first_item}&page=0"
-    )
-
-    time.sleep(15)  # Waits for the page to load
+from location_session import (
+    SEARCH_URL,
+    restore_location_session,
+    save_location_session,
+)
+from page_cache import LAST_PAGE
+from settings import SETTINGS
+from tracing import span
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+def set_location(
+    driver, first_item: str, zip_: str, timeout: int = 30, url: str = SEARCH_URL
+) -> dict:
+    """Sets the store location for the session. Every step waits on the DOM
+    condition it depends on; returns how long each step took, in seconds"""
+    timings = {}
+    wait = WebDriverWait(driver, timeout)
+    started = time.perf_counter()
+
+    def lap(step: str) -> None:
+        nonlocal started
+        now = time.perf_counter()
+        timings[step] = round(now - started, 2)
+        started = now
+
+    driver.get(f"{url}/{first_item}?title={first_item}&page=0")
 
     # Tries to remove view-blocking elements
-    e = driver.find_element(By.ID, "usercentrics-root")
-    driver.execute_script("arguments[0].remove();", e)
+    try:
+        e = wait.until(EC.presence_of_element_located((By.ID, "usercentrics-root")))
+        driver.execute_script("arguments[0].remove();", e)
+    except TimeoutException:
+        pass
+    lap("Consent")
 
     # Opens location input
-    location_input = driver.find_element(By.CLASS_NAME, "location-default-text")
-    # print(location_input)
+    location_input = wait.until(
+        EC.element_to_be_clickable((By.CLASS_NAME, "location-default-text"))
+    )
     location_input.click()
 
-    time.sleep(5)
-
     # Selects the location input and enters the ZIP code
-    inputs = driver.find_elements(By.TAG_NAME, "input")
-    inputs[1].send_keys(zip_ + Keys.ENTER)
+    def zip_input_visible(driver):
+        inputs = driver.find_elements(By.TAG_NAME, "input")
+        return len(inputs) > 1 and inputs[1].is_displayed() and inputs[1]
+
+    zip_input = wait.until(zip_input_visible)
+    lap("Location input")
+
+    zip_input.send_keys(zip_ + Keys.ENTER)
 
-    time.sleep(5)
+    # Waits for the address suggestions matching the ZIP code
+    wait.until(
+        EC.visibility_of_any_elements_located(
+            (By.XPATH, f"//*[not(self::input)][contains(text(), '{zip_}')]")
+        )
+    )
+    lap("Suggestions")
 
     # Selects the first address
     driver.switch_to.active_element.send_keys(Keys.ARROW_DOWN)
-    time.sleep(2)
     driver.switch_to.active_element.send_keys(Keys.ENTER)
 
-    time.sleep(5)
+    try:
+        wait.until(
+            EC.text_to_be_present_in_element((By.CLASS_NAME, "location-text"), zip_)
+        )
+    except TimeoutException:
+        pass
+    lap("Location text")
 
+    return timings
 
-def search_page(
-    driver, url: str, item: str, page: int, zip_: str, store_data: dict
-) -> list:
-    results = []
 
-    driver.get(f"{url}/{item}?title={item}&page={page}")
+def ensure_location(driver, first_item: str, zip_: str, url: str = SEARCH_URL) -> dict:
+    """Reuses a saved location session for the ZIP code if there is a fresh one,
+    otherwise runs set_location and saves the session for later runs"""
+    if getattr(driver, "located_for", None) == (zip_, url):
+        return {"Warm browser": 0.0}  # a pooled browser already set to the ZIP code
 
-    # Exit condition: last page found, continues with the next item
-    # ---------------------------
-    WebDriverWait(driver, 10).until(
-        EC.visibility_of_element_located((By.CLASS_NAME, "headline"))
-    )
-    assert item.upper() in driver.find_element(By.CLASS_NAME, "headline").text
+    started = time.perf_counter()
+    if restore_location_session(driver, first_item, zip_, url=url):
+        driver.located_for = (zip_, url)
+        return {"Restored session": round(time.perf_counter() - started, 2)}
 
-    # Waits until the Item cards are loaded - affects the results
-    WebDriverWait(driver, 120).until(
-        EC.visibility_of_all_elements_located((By.TAG_NAME, "li"))
-    )
+    timings = {"Session check": round(time.perf_counter() - started, 2)}
+    timings.update(set_location(driver, first_item, zip_, url=url))
 
-    # ---------------------------
     location_text = driver.find_element(By.CLASS_NAME, "location-text").text
-    # print(location_text)
-    if zip_ not in location_text:
-        # print("Warning: Location not set")
-        ...
-
-    # Parses the page
-    # ---------------------------
-    bs = BeautifulSoup(driver.page_source, "html.parser")
-
-    lis = bs.select("li")
-    not_found = 0
-    for li in lis:
-        name = li.select(store_data["name"])
-        i = {}
-        if len(name) > 0:
-            # Item
-            # ---------------------------
-            i["Item"] = item
-
-            # Name
-            # ---------------------------
-            i["Name"] = "".join([x.text for x in name]).rstrip().lower()
-
-            # Date valid
-            # ---------------------------
-            dd = li.select(store_data["dv"])
-            i["Date valid"] = "".join([x.text for x in dd]).rstrip().lower()
-
-            # Store
-            # ---------------------------
-            a = li.select(store_data["store1"] + " > a")
-            if len(list(a)) == 0:
-                store = li.select(store_data["store1"])
-                if len(list(store)) == 0:
-                    span = li.select(store_data["store1"] + " > span")
-                    i["Store"] = "".join([x.text for x in span]).rstrip().lower()
-                else:
-                    i["Store"] = "".join([x.text for x in store]).rstrip().lower()
+    if zip_ in location_text:
+        save_location_session(driver, zip_)
+        driver.located_for = (zip_, url)
+
+    return timings
+
+
+def format_timings(timings: dict) -> str:
+    return ", ".join([f"{step} {seconds:.1f}s" for step, seconds in timings.items()])
+
+
+class PageCount(NamedTuple):
+    pages: int
+    exact: bool  # False when only a lower bound could be read
+
+
+def read_page_count(
+    headline: Optional[str], last_page_link: Optional[int], item: str, cards: int
+) -> Optional[PageCount]:
+    """Reads the number of result pages from the total in the headline, or a
+    lower bound from the highest page linked in the pagination"""
+    headline = (headline or "").upper().replace(item.upper(), "")
+    match = re.search(r"\d[\d.]*", headline)
+    if match is not None and cards > 0:
+        total = int(match.group().replace(".", ""))
+        return PageCount(max(1, math.ceil(total / cards)), True)
+
+    if last_page_link is not None:
+        return PageCount(last_page_link + 1, False)
+
+    return None
+
+
+def get_last_page_link(html: str) -> Optional[int]:
+    pages = [int(x) for x in re.findall(r"[?&](?:amp;)?page=(\d+)", html)]
+
+    return max(pages) if len(pages) > 0 else None
+
+
+class ItemPages:
+    """Decides which pages of an item to fetch next. With an exact page count
+    all pages are scheduled after the first one, and the pages after the count
+    are probed when the last one comes back full, in case the total was rounded
+    or capped (an only page with results counts as full, as its size is the
+    only one known); with a lower bound the pages up to it are scheduled and the ones
+    after it are probed one by one; without a count every page is probed until
+    the headline check fails. In incremental mode nothing more is fetched when
+    the first page hasn't changed"""
+
+    def __init__(self, item: str = "", runs=None) -> None:
+        self.item = item
+        self.runs = runs
+        self.probe_from = 1
+        self.last_page = 0
+        self.page_size = 0
+
+    def after(
+        self,
+        page: int,
+        page_count: Optional[PageCount] = None,
+        results: Optional[list] = None,
+    ) -> list:
+        if page == 0:
+            if self.runs is not None and self.runs.check_first_page(
+                self.item, results or []
+            ):
+                return []
+            if page_count is None:
+                return [1]
+            if page_count.exact:
+                self.probe_from = math.inf
+                self.last_page = page_count.pages - 1
+                self.page_size = len(results or [])
+                if self.last_page > 0:
+                    return list(range(1, page_count.pages))
             else:
-                i["Store"] = "".join([x.text for x in a]).rstrip().lower()
-
-            # Brand
-            # ---------------------------
-            brand_a = li.select(store_data["brand1"] + " > a")
-            if len(list(brand_a)) == 0:
-                brand = li.select(store_data["brand1"])
-                if len(list(brand)) == 0:
-                    brand_span = li.select(store_data["brand1"] + " > span")
-                    i["Brand"] = "".join([x.text for x in brand_span]).rstrip().lower()
-                else:
-                    i["Brand"] = "".join([x.text for x in brand]).rstrip().lower()
+                self.probe_from = page_count.pages
+                return list(range(1, page_count.pages + 1))
+
+        if page == self.last_page and 0 < self.page_size <= len(results or []):
+            self.probe_from = page  # a full last page, more may follow
+
+        return [page + 1] if page >= self.probe_from else []
+
+
+def fetch_page(
+    driver,
+    url: str,
+    item: str,
+    page: int,
+    zip_: str,
+    store_data: dict,
+    fetcher=None,
+    cache=None,
+) -> tuple:
+    """Returns the records of the page and, for the first page, its page count"""
+    with span("page", item=item, page=page) as event:
+        if cache is not None:
+            cached = cache.get(item, page)
+            if cached == LAST_PAGE:
+                event["last_page"] = True
+                raise AssertionError
+            if cached is not None:
+                event["cached"] = True
+                event["records"] = len(cached[0])
+                return cached
+
+        fetcher = fetcher or SeleniumFetcher(driver, card_selector(store_data))
+        page_url = f"{url}/{item}?title={item}&page={page}"
+
+        try:
+            # Extracts the cards in the browser when the page is loaded by Chrome
+            if store_data.get("extraction") == "js" and isinstance(
+                fetcher, SeleniumFetcher
+            ):
+                results, headline, last_page_link = fetcher.extract(
+                    page_url, item, zip_, compile_plan(store_data)
+                )
+                empty = zero_total(headline, item)
+                if not empty:
+                    check_results(results)
             else:
-                i["Brand"] = "".join([x.text for x in brand_a]).rstrip().lower()
+                html = fetcher.fetch(page_url, item, zip_)
+                event["bytes"] = len(html.encode("utf-8"))
+                headline = get_element_text(html, "headline")
+                last_page_link = get_last_page_link(html)
+                empty = zero_total(headline, item)
+                results = [] if empty else parse_page(html, item, store_data)
 
-            # Price
-            # ---------------------------
-            price_strong = li.select(store_data["price1"])
-            if len(list(price_strong)) == 0:
-                price_dd = li.select(store_data["price2"])
-                price_p = li.select(store_data["price3"])
+            # A zero total: no offers for the item, or past its last page
+            assert page == 0 or not empty
+        except AssertionError:
+            event["last_page"] = True
+            if cache is not None:
+                cache.set(item, page, LAST_PAGE)
+            raise
 
-                i["Price"] = "".join([x.text for x in price_dd]).rstrip().lower()
-                i["Note"] = "".join([x.text for x in price_p]).rstrip().lower()
-            else:
-                i["Price"] = (
-                    "".join([x.text for x in price_strong])
-                    .split("-")[0]
-                    .rstrip()
-                    .lower()
-                )
+        event["records"] = len(results)
+
+        page_count = None
+        if page == 0 and empty:
+            page_count = PageCount(1, True)
+        elif page == 0:
+            page_count = read_page_count(headline, last_page_link, item, len(results))
+
+        if cache is not None:
+            cache.set(item, page, (results, page_count))
 
-            # print(i)  # for debugging
+        return results, page_count
 
-            results.append(i)
-        else:
-            not_found += 1
+
+def search_page(
+    driver, url: str, item: str, page: int, zip_: str, store_data: dict, fetcher=None
+) -> list:
+    return fetch_page(driver, url, item, page, zip_, store_data, fetcher)[0]
+
+
+def iter_search_pages(
+    driver,
+    url: str,
+    item: str,
+    zip_: str,
+    store_data: dict,
+    fetcher=None,
+    cache=None,
+    runs=None,
+) -> Iterator[tuple]:
+    """Yields (page, records) for each search page of the item as it is
+    scraped, up to the last page"""
+    item_pages = ItemPages(item, runs)
+    pending = [0]
+    while len(pending) > 0:
+        page = pending.pop(0)
+        try:
+            page_results, page_count = fetch_page(
+                driver, url, item, page, zip_, store_data, fetcher, cache
+            )
+        except AssertionError:
+            # Reached the last page
             continue
 
+        pending.extend(item_pages.after(page, page_count, page_results))
+
+        yield page, page_results
+
+
+def parse_page(html: str, item: str, store_data: dict) -> list:
+    # Parses the page
+    # ---------------------------
+    with span("parse", fallbacks=Counter()) as event:
+        results = compile_plan(store_data).extract(html, item, event["fallbacks"])
+
     # For debugging
     # with open("debug.html", "w") as f:
-    #     f.write(driver.page_source)
+    #     f.write(html)
     # with open("results.txt", "w") as f:
     #     f.write(repr(results))
 
-    if len(lis) == not_found:
+    return check_results(results)
+
+
+def check_results(results: list) -> list:
+    if len(results) == 0:
         raise Exception(
             "Warning: Getting empty results. Please check the 'Name' selector for changes, save the settings, and retry"
         )
@@ -160,29 +342,271 @@ def search_page(
     return results
 
 
-def launch_scraper(driver, url, shopping_list, zip_, store_data, set_progress):
-    data = []
-    for item in shopping_list:
-        page = 0
-        while True:
-            set_progress(("Scraping", ": ", f"'{item}' - page {page + 1}", 60))
+def launch_scraper(
+    driver, url, shopping_list, zip_, store_data, set_progress, cache=None, runs=None
+):
+    return list(
+        iter_scraper(
+            driver, url, shopping_list, zip_, store_data, set_progress, cache, runs
+        )
+    )
 
-            try:
-                page_results = search_page(driver, url, item, page, zip_, store_data)
 
-                data.extend(page_results)
-            except AssertionError:
-                # Reached the last page
-                break
-            except Exception:
-                raise
+def iter_scraper(
+    driver, url, shopping_list, zip_, store_data, set_progress, cache=None, runs=None
+) -> Iterator[dict]:
+    """Yields the records page by page as they are scraped, in shopping list
+    order, so they can be written out without collecting the whole run"""
+    fetcher = get_fetcher(driver, store_data, get_http_fetcher(driver, store_data))
 
-            page += 1
+    for item in shopping_list:
+        pages = iter_search_pages(
+            driver, url, item, zip_, store_data, fetcher, cache, runs
+        )
+        for page, page_results in pages:
+            text = f"'{item}' - page {page + 1}"
+            if cache is not None:
+                text += f" ({cache.summary()})"
+            set_progress(("Scraping", ": ", text, 60))
+
+            yield from page_results
+
+
+def launch_scraper_pool(
+    driver,
+    path_,
+    url,
+    shopping_list,
+    zip_,
+    store_data,
+    set_progress,
+    workers,
+    cache=None,
+    runs=None,
+):
+    """Scrapes the shopping list with several Chrome drivers pulling pages from a
+    shared queue. `driver` is already located and is used by the first worker.
+    The first page of an item schedules the item's other pages"""
+    if len(shopping_list) == 0:
+        return []
+
+    pages = queue.Queue()
+    for n, item in enumerate(shopping_list):
+        pages.put((n, item, 0))
+    outstanding = [1 for _ in shopping_list]  # pages queued or in progress
+
+    http_fetcher = get_http_fetcher(driver, store_data)
+
+    item_pages = [ItemPages(item, runs) for item in shopping_list]
+    results = {}
+    status = {}
+    errors = []
+    lock = threading.Lock()
+
+    def report(worker: int, text: str) -> None:
+        with lock:
+            status[worker] = text
+            done = outstanding.count(0)
+            progress = 40 + int(40 * done / len(shopping_list))
+            text = " | ".join([f"#{w + 1} {status[w]}" for w in sorted(status)])
+            if cache is not None:
+                text += f" ({cache.summary()})"
+            set_progress(("Scraping", ": ", text, progress))
+
+    def work(worker: int) -> None:
+        worker_driver = driver if worker == 0 else None
+        try:
+            if worker_driver is None:
+                report(worker, "starting")
+                worker_driver = lease_driver(
+                    path_, store_data, f"Chrome-{worker}", worker=worker
+                )
+                try:
+                    timings = ensure_location(
+                        worker_driver, shopping_list[0], zip_, url
+                    )
+                    report(worker, f"location set in {sum(timings.values()):.1f}s")
+                except ElementNotInteractableException:
+                    pass
+
+            fetcher = get_fetcher(worker_driver, store_data, http_fetcher)
+
+            while not errors:
+                try:
+                    n, item, page = pages.get(timeout=0.1)
+                except queue.Empty:
+                    with lock:
+                        if sum(outstanding) == 0:
+                            break
+                    continue
+
+                report(worker, f"'{item}' - page {page + 1}")
+
+                next_pages = []
+                try:
+                    page_results, page_count = fetch_page(
+                        worker_driver,
+                        url,
+                        item,
+                        page,
+                        zip_,
+                        store_data,
+                        fetcher,
+                        cache,
+                    )
+                    next_pages = item_pages[n].after(page, page_count, page_results)
+                except AssertionError:
+                    # Reached the last page
+                    page_results = []
+
+                with lock:
+                    results[(n, page)] = page_results
+                    for next_page in next_pages:
+                        pages.put((n, item, next_page))
+                    outstanding[n] += len(next_pages) - 1
+
+            report(worker, "done")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if worker != 0:
+                release_driver(worker_driver)
+
+    threads = [
+        threading.Thread(target=work, args=(worker,), daemon=True)
+        for worker in range(max(1, min(workers, len(shopping_list))))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    # Merges the results in shopping list and page order
+    data = []
+    for key in sorted(results):
+        data.extend(results[key])
 
     return data
 
 
-def generate_output(data: list, lp: str, item_blacklist: list, filter: bool) -> str:
+def parse_prices(prices: pd.Series) -> pd.Series:
+    """The number after the first space of each price, 999.9 if cannot process
+    the price"""
+    numbers = prices.str.extract(r"^[^ ]* ([^ ]*)", expand=False)
+    if numbers.isna().any():
+        raise ValueError("Price without a number")
+
+    return pd.to_numeric(
+        numbers.str.replace(",", ".", regex=False), errors="coerce"
+    ).fillna(999.9)
+
+
+def lowest_price_marker(df: pd.DataFrame, lp: str) -> np.ndarray:
+    """'✅ <lp>' on the rows with the lowest price of their `lp` group"""
+    lowest = df["Price"] == df.groupby(lp)["Price"].transform("min")
+
+    return np.where(lowest, "✅ " + df[lp].astype(str), "")
+
+
+def blank_repeats(df: pd.DataFrame, group: str, columns: list) -> pd.DataFrame:
+    """Blanks the `columns` values repeating the previous row's within a `group`
+    run, so only the first row of each Store/Item shows them"""
+    df = df.copy()
+    same_group = df[group].eq(df[group].shift())
+    for column in columns:
+        repeated = same_group & df[column].eq(df[column].shift())
+        df[column] = df[column].where(~repeated, "")
+
+    return df
+
+
+def write_grouped_excel(df: pd.DataFrame, path: str, group: str = "Store") -> None:
+    """Writes one table per `group` value, each with its own header and a blank
+    row in between, in a single pass of a write-only workbook. `df` must be
+    sorted by `group`"""
+    side = Side(style="thin")
+    header_style = {
+        "font": Font(bold=True),
+        "border": Border(left=side, right=side, top=side, bottom=side),
+        "alignment": Alignment(horizontal="center", vertical="top"),
+    }
+
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet("Sheet1")
+
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(sheet, value=column)
+        for attribute, style in header_style.items():
+            setattr(cell, attribute, style)
+        header.append(cell)
+
+    starts = df[group].ne(df[group].shift()).to_numpy()
+    df = blank_repeats(df, group, ["Store", "Item"])
+    values = df.astype(object).where(df.notna(), None)
+
+    for e, (start, row) in enumerate(
+        zip(starts, values.itertuples(index=False, name=None))
+    ):
+        if start:
+            if e > 0:
+                sheet.append([])  # blank row between the tables
+            sheet.append(header)
+        sheet.append(row)
+
+    book.save(path)
+
+
+def typed_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The results with a float Price and categorical Store and Item, for the
+    columnar formats"""
+    return df.astype({"Store": "category", "Item": "category", "Price": "float64"})
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    if pa is None:
+        raise Exception(
+            "Warning: Writing Parquet needs the 'pyarrow' package. Please install it or choose another output format"
+        )
+
+    typed_frame(df).to_parquet(path, index=False)
+
+
+def write_csv(df: pd.DataFrame, path: str) -> None:
+    df.to_csv(path, index=False, encoding="utf-8")
+
+
+def write_sqlite(df: pd.DataFrame, path: str, table: str = "results") -> None:
+    # SQLite has no categorical type, the columns are stored as TEXT
+    with closing(sqlite3.connect(path)) as connection:
+        df.to_sql(
+            table,
+            connection,
+            index=False,
+            if_exists="replace",
+            dtype={"Price": "REAL"},
+        )
+
+
+OUTPUT_FORMATS = {
+    "xlsx": write_grouped_excel,
+    "parquet": write_parquet,
+    "csv": write_csv,
+    "sqlite": write_sqlite,
+}
+
+
+def generate_output(
+    data: list,
+    lp: str,
+    item_blacklist: list,
+    filter: bool,
+    formats: list = None,
+    threshold: float = SETTINGS["filter_threshold"],
+) -> str:
     warnings.simplefilter(action="ignore", category=FutureWarning)
 
     df_len = len(data)
@@ -203,11 +627,11 @@ def generate_output(data: list, lp: str, item_blacklist: list, filter: bool) ->
 
     # Blacklist
     # ---------------------------
-    df = df[~df["Name"].isin(item_blacklist)]
+    df = df[~compile_blacklist(tuple(item_blacklist)).mask(df)]
 
     # Auto filter
     if filter:
-        df = rank_similarity(df)
+        df = rank_similarity(df, threshold)
 
     # Handles Price and Units
     # ---------------------------
@@ -218,14 +642,8 @@ def generate_output(data: list, lp: str, item_blacklist: list, filter: bool) ->
             "Warning: Issue with the 'Price'/'Unit' selector. Please check HTML tags for changes, save the settings, and retry"
         )
 
-    def str_to_float(x: str) -> float:
-        try:
-            return float(x.split(" ")[1].replace(",", "."))
-        except ValueError:
-            return 999.9  # returns 999.9 if cannot process the price
-
     try:
-        df["Price"] = df["Price"].apply(lambda x: str_to_float(x))
+        df["Price"] = parse_prices(df["Price"])
         df.sort_values(
             ["Store", "Item", "Price"], ascending=True, inplace=True
         )  # sorting the Price from lowest to highest
@@ -245,11 +663,7 @@ def generate_output(data: list, lp: str, item_blacklist: list, filter: bool) ->
 
     # Lowest price indicator
     # ---------------------------
-    df["LP"] = df.groupby([lp])["Price"].transform("min")
-    df["Lowest price across stores"] = df.apply(
-        lambda x: f"✅ {x[lp]}" if x["LP"] == x["Price"] else "", axis=1
-    )
-    df.drop(["LP"], axis=1, inplace=True)  # remove the temporary column
+    df["Lowest price across stores"] = lowest_price_marker(df, lp)
 
     # Removing duplicate entries
     # ---------------------------
@@ -270,29 +684,12 @@ def generate_output(data: list, lp: str, item_blacklist: list, filter: bool) ->
         random.choices(string.ascii_uppercase + string.ascii_lowercase, k=5)
     )
 
-    gbo = df.groupby(["Store"])
-
-    # Creates an empty Excel file
-    blank_line = pd.DataFrame()
-    blank_line.to_excel(f"{today}_{postfix}.xlsx", index=False)
-
-    # Loads the file, sets up ExcelWriter
-    book = load_workbook(f"{today}_{postfix}.xlsx")
-    writer = pd.ExcelWriter(f"{today}_{postfix}.xlsx", engine="openpyxl")
-    writer.sheets.update({ws.title: ws for ws in book.worksheets})
-
-    # Applies formatting to grouped by tables and writes to the file
-    for e, (_, o) in enumerate(gbo):
-        o[["Store", "Item"]] = o[["Store", "Item"]].where(
-            o[["Store", "Item"]].apply(lambda x: x != x.shift()), ""
-        )
-        if e == 0:
-            o.to_excel(writer, index=False)
-        else:
-            o.to_excel(
-                writer, startrow=writer.sheets["Sheet1"].max_row + 1, index=False
-            )
+    formats = [x for x in OUTPUT_FORMATS if x in (formats or ["xlsx"])]
 
-    writer.close()
+    files = []
+    for format_ in formats:
+        files.append(f"{today}_{postfix}.{format_}")
+        with span(f"write {format_}"):
+            OUTPUT_FORMATS[format_](df, files[-1])
 
-    return f"{today}_{postfix}.xlsx"
+    return files[0]  # the workbook, if it was written
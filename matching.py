@@ -0,0 +1,74 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# A hyphenated compound is one word: "Milch-Schnitte" isn't milk, "Bio-Milch" is
+TOKEN = re.compile(r"\w+(?:-\w+)*")
+
+
+def normalize(text: str) -> str:
+    """Lower case without accents, so "Bio Äpfel" and "äpfel" compare equal"""
+    text = unicodedata.normalize("NFKD", str(text).casefold().replace("ß", "ss"))
+
+    return "".join([x for x in text if not unicodedata.combining(x)])
+
+
+@lru_cache(maxsize=None)
+def tokenize(text: str) -> tuple:
+    return tuple(TOKEN.findall(normalize(text)))
+
+
+@lru_cache(maxsize=None)
+def bigrams(token: str) -> frozenset:
+    """Character bigrams of the token padded with spaces, so its start and end
+    count as grams of their own"""
+    padded = f" {token} "
+
+    return frozenset([padded[x : x + 2] for x in range(len(padded) - 1)])
+
+
+def dice(a: str, b: str) -> float:
+    """Dice coefficient of the bigrams of two tokens"""
+    a_grams, b_grams = bigrams(a), bigrams(b)
+
+    return 2 * len(a_grams & b_grams) / (len(a_grams) + len(b_grams))
+
+
+@lru_cache(maxsize=None)
+def token_similarity(item: str, token: str) -> float:
+    """Best match of the item word against the endings of a name word of about
+    its length. German compounds end with what they are, so "Vollmilch" is milk
+    but "Milchschokolade" isn't; the fuzzy comparison also lets plurals and
+    small spelling differences through"""
+    return max(
+        [dice(item, token[-x:]) for x in range(max(1, len(item) - 1), len(item) + 3)]
+    )
+
+
+def match_score(item: str, name: str) -> float:
+    """How well the name matches the searched item, from 0 to 1: each item word
+    is scored against its closest name word and the scores are averaged"""
+    item_tokens, name_tokens = tokenize(item), tokenize(name)
+    if len(item_tokens) == 0 or len(name_tokens) == 0:
+        return 0.0
+
+    return sum(
+        [max([token_similarity(x, y) for y in name_tokens]) for x in item_tokens]
+    ) / len(item_tokens)
+
+
+def match_scores(items: pd.Series, names: pd.Series) -> np.ndarray:
+    """match_score of every row, computed once per distinct (item, name) pair"""
+    pairs = pd.MultiIndex.from_arrays([items.astype(str), names.astype(str)])
+    codes, uniques = pairs.factorize()
+
+    scores = np.fromiter(
+        (match_score(item, name) for item, name in uniques),
+        dtype=float,
+        count=len(uniques),
+    )
+
+    return scores[codes]
@@ -0,0 +1,156 @@
+import math
+from functools import lru_cache
+
+import diskcache
+
+from tracing import add_observer
+
+METRICS_DIR = "metrics"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+SECONDS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# Name: (type, help, histogram buckets)
+METRICS = {
+    "marktguru_pages_fetched_total": (
+        "counter",
+        "Search pages fetched, from the network or the page cache",
+        None,
+    ),
+    "marktguru_page_latency_seconds": (
+        "histogram",
+        "Time to fetch and extract a search page",
+        SECONDS,
+    ),
+    "marktguru_parse_seconds": (
+        "histogram",
+        "Time to extract the records of a search page",
+        SECONDS,
+    ),
+    "marktguru_records_per_page": (
+        "histogram",
+        "Records extracted from a search page",
+        [0, 5, 10, 20, 30, 50, 100],
+    ),
+    "marktguru_selector_fallback_hits_total": (
+        "counter",
+        "Cards whose field was found by a fallback selector",
+        None,
+    ),
+    "marktguru_driver_starts_total": (
+        "counter",
+        "Chrome drivers started, or attached to a warm pooled browser",
+        None,
+    ),
+    "marktguru_driver_restarts_total": (
+        "counter",
+        "Chrome drivers started again, after a chromedriver download or to replace a pooled browser",
+        None,
+    ),
+    "marktguru_cache_hits_total": ("counter", "Page cache hits", None),
+    "marktguru_cache_misses_total": ("counter", "Page cache misses", None),
+    "marktguru_runs_total": ("counter", "Scrape runs, by outcome", None),
+    "marktguru_run_duration_seconds": (
+        "histogram",
+        "Duration of a scrape run",
+        [5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600],
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def get_store() -> diskcache.Cache:
+    """Metric values on disk, shared by the server and the scrape processes"""
+    return diskcache.Cache(METRICS_DIR)
+
+
+def labels_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: int = 1, **labels) -> None:
+    if value != 0:
+        get_store().incr((name, labels_key(labels)), value)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Adds the value to the histogram's buckets, count and sum"""
+    buckets = METRICS[name][2]
+    key = (name, labels_key(labels))
+
+    store = get_store()
+    with store.transact():
+        counts, total = store.get(key, ([0] * (len(buckets) + 1), 0.0))
+        for x, le in enumerate(buckets):
+            if value <= le:
+                counts[x] += 1
+        counts[-1] += 1  # +Inf, also the count
+        store.set(key, (counts, total + value))
+
+
+def observe_span(stage: str, seconds: float, event: dict) -> None:
+    """Records the metrics of the scraper's traced stages"""
+    if stage == "page":
+        source = "cache" if event.get("cached") else "network"
+        inc("marktguru_pages_fetched_total", source=source)
+        if not event.get("last_page"):
+            observe("marktguru_page_latency_seconds", seconds, source=source)
+            observe("marktguru_records_per_page", event.get("records", 0))
+    elif stage == "parse":
+        observe("marktguru_parse_seconds", seconds)
+        for field, hits in event.get("fallbacks", {}).items():
+            inc("marktguru_selector_fallback_hits_total", hits, field=field)
+    elif stage == "get_driver":
+        inc("marktguru_driver_starts_total", warm=bool(event.get("warm")))
+        if event.get("downloaded_driver") or event.get("recycled"):
+            inc("marktguru_driver_restarts_total")
+
+
+add_observer(observe_span)
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(labels: tuple) -> str:
+    if len(labels) == 0:
+        return ""
+
+    escaped = [
+        (k, v.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for k, v in labels
+    ]
+
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def render() -> str:
+    """The metrics in the Prometheus text exposition format"""
+    store = get_store()
+    samples = {}
+    for key in store:
+        value = store.get(key)
+        if value is not None:
+            samples.setdefault(key[0], []).append((key[1], value))
+
+    lines = []
+    for name, (type_, help_, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_}")
+        lines.append(f"# TYPE {name} {type_}")
+        for labels, value in sorted(samples.get(name, [])):
+            if type_ == "counter":
+                lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+
+            counts, total = value
+            for le, count in zip([*buckets, math.inf], counts):
+                bucket_labels = (*labels, ("le", format_value(le)))
+                lines.append(f"{name}_bucket{format_labels(bucket_labels)} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{name}_count{format_labels(labels)} {counts[-1]}")
+
+    return "\n".join(lines) + "\n"
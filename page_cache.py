@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+from datetime import date
+from typing import Optional
+
+import diskcache
+
+from extraction import SELECTORS
+from settings import SETTINGS
+
+CACHE_DIR = "page_cache"
+LAST_PAGE = "last page"  # cached when the headline check failed
+
+
+def selector_hash(store_data: dict) -> str:
+    selectors = [store_data[x] for x in SELECTORS]
+
+    return hashlib.sha1(json.dumps(selectors).encode("utf-8")).hexdigest()[:12]
+
+
+class PageCache:
+    """On-disk cache of extracted search pages keyed by item, page, ZIP code,
+    selectors and date. Entries expire after `ttl` seconds and the least
+    recently used ones are evicted above `size_limit` bytes. With `refresh`
+    every page is fetched again and the cache is only written"""
+
+    def __init__(
+        self,
+        store_data: dict,
+        zip_: str,
+        ttl: int,
+        size_limit: int,
+        refresh: bool = False,
+        directory: str = CACHE_DIR,
+    ) -> None:
+        self.cache = diskcache.Cache(
+            directory,
+            size_limit=size_limit,
+            eviction_policy="least-recently-used",
+        )
+        self.ttl = ttl
+        self.refresh = refresh
+        self.prefix = (zip_, selector_hash(store_data), date.today().isoformat())
+
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, item: str, page: int) -> Optional[object]:
+        value = None if self.refresh else self.cache.get((*self.prefix, item, page))
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, item: str, page: int, value: object) -> None:
+        self.cache.set((*self.prefix, item, page), value, expire=self.ttl)
+
+    def summary(self) -> str:
+        return f"cache {self.hits} hits, {self.misses} misses"
+
+    def close(self) -> None:
+        self.cache.close()
+
+
+def get_page_cache(store_data: dict, zip_: str, refresh: bool) -> Optional[PageCache]:
+    ttl = float(store_data.get("cache_ttl", SETTINGS["cache_ttl"]) or 0)
+    if ttl <= 0:
+        return None
+
+    size = float(store_data.get("cache_size") or SETTINGS["cache_size"])
+
+    return PageCache(
+        store_data,
+        zip_,
+        ttl=int(ttl * 60 * 60),
+        size_limit=int(size * 1024 * 1024),
+        refresh=refresh,
+    )
@@ -0,0 +1,71 @@
+import soupsieve
+from bs4 import BeautifulSoup
+from soupsieve.util import SelectorSyntaxError
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser, SelectolaxError
+except ImportError:
+    LexborHTMLParser = None
+
+PARSERS = ["selectolax", "lxml", "html.parser"]
+
+
+class SoupParser:
+    """BeautifulSoup tree with soupsieve selectors, built by the given tree builder"""
+
+    def __init__(self, features: str = "html.parser") -> None:
+        self.features = features
+
+    def parse(self, html: str):
+        return BeautifulSoup(html, self.features)
+
+    def compile(self, selector: str):
+        return soupsieve.compile(selector)
+
+    def select(self, node, selector) -> list:
+        return selector.select(node)
+
+    def text(self, nodes: list) -> str:
+        return "".join([x.text for x in nodes])
+
+
+class SelectolaxParser:
+    """Lexbor tree and selector engine. Script and style contents are dropped so
+    the text matches BeautifulSoup's"""
+
+    def parse(self, html: str):
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(["script", "style", "template"])
+
+        return tree.root
+
+    def compile(self, selector: str) -> str:
+        """Lexbor has no reusable compiled selectors, so this only validates it"""
+        try:
+            LexborHTMLParser("").root.css(selector)
+        except SelectolaxError as e:
+            raise SelectorSyntaxError(str(e), selector, 0) from e
+
+        return selector
+
+    def select(self, node, selector: str) -> list:
+        return node.css(selector)
+
+    def text(self, nodes: list) -> str:
+        return "".join([x.text() for x in nodes])
+
+
+def get_parser(name: str = "selectolax"):
+    """Returns the parser backend, falling back to the next one available if an
+    optional dependency is not installed"""
+    if name == "selectolax" and LexborHTMLParser is not None:
+        return SelectolaxParser()
+    if name in ["lxml", "selectolax"] and lxml is not None:
+        return SoupParser("lxml")
+
+    return SoupParser("html.parser")
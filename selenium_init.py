@@ -4,45 +4,85 @@ from fake_useragent import UserAgent
 from selenium.webdriver import Chrome, ChromeOptions
 
 from helpers import check_chrome_driver_exe_path, check_chrome_exe_path
+from settings import SETTINGS
 
 
 class ChromeBinaryNotFound(Exception):
     """Raised when Chrome executable is not found at the path specified"""
 
 
-def get_driver(chrome_binary_location, headless=False):
+def check_paths(chrome_binary_location) -> None:
+    if not check_chrome_exe_path(chrome_binary_location):
+        raise ChromeBinaryNotFound(
+            "Chrome executable not found. Please check the settings and save any changes"
+        )
+    if not check_chrome_driver_exe_path():
+        raise FileNotFoundError("chromedriver.exe not found")
+
+
+def get_options(
+    chrome_binary_location, headless=False, user_data_dir="Chrome", page_load="normal"
+):
+    options = ChromeOptions()
+    options.page_load_strategy = page_load  # eager returns at DOMContentLoaded
+
+    options.add_argument(f"--user-agent={UserAgent().random}")
+    options.add_argument("--start-maximized")
+    options.add_argument("--disable-backgrounding-occluded-windows")
+    options.add_argument("--disable-background-timer-throttling")
+    options.add_argument("--disable-renderer-backgrounding")
+
+    if headless == True:
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--headless=chrome")
+        options.add_argument("--disable-gpu")
+
+    wd = os.path.join(os.getcwd(), user_data_dir)
+    options.add_argument(rf"user-data-dir={wd}")
+    options.add_argument("profile-directory=Profile")
+    options.add_argument("--log-level=3")
+
+    options.binary_location = chrome_binary_location
+
+    return options
+
+
+def get_blocked_urls(store_data: dict) -> list:
+    if not store_data.get("lean_pages", SETTINGS["lean_pages"]):
+        return []
+
+    return store_data.get("blocked_urls", SETTINGS["blocked_urls"])
+
+
+def block_urls(driver, patterns: list) -> None:
+    """Drops the driver's requests matching the URL patterns, such as images,
+    fonts and trackers the scraper never reads"""
+    if len(patterns) > 0:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+
+def get_driver(
+    chrome_binary_location, headless=False, user_data_dir="Chrome", store_data=None
+):
+    """With `store_data`, loads lean pages as set there"""
     try:
-        if not check_chrome_exe_path(chrome_binary_location):
-            raise ChromeBinaryNotFound(
-                "Chrome executable not found. Please check the settings and save any changes"
-            )
-        if not check_chrome_driver_exe_path():
-            raise FileNotFoundError("chromedriver.exe not found")
-
-        options = ChromeOptions()
-
-        options.add_argument(f"--user-agent={UserAgent().random}")
-        options.add_argument("--start-maximized")
-        options.add_argument("--disable-backgrounding-occluded-windows")
-        options.add_argument("--disable-background-timer-throttling")
-        options.add_argument("--disable-renderer-backgrounding")
-
-        if headless == True:
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--headless=chrome")
-            options.add_argument("--disable-gpu")
-
-        wd = os.path.join(os.getcwd(), "Chrome")
-        options.add_argument(rf"user-data-dir={wd}")
-        options.add_argument("profile-directory=Profile")
-        options.add_argument("--log-level=3")
-
-        options.binary_location = chrome_binary_location
+        check_paths(chrome_binary_location)
+
+        page_load, blocked_urls = "normal", []
+        if store_data is not None:
+            page_load = store_data.get("page_load", SETTINGS["page_load"])
+            blocked_urls = get_blocked_urls(store_data)
+
+        options = get_options(
+            chrome_binary_location, headless, user_data_dir, page_load
+        )
 
         driver = Chrome(
             options=options,
         )
+        block_urls(driver, blocked_urls)
 
         return driver
     except:
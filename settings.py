@@ -13,4 +13,50 @@ SETTINGS = {
     "price3": "div.info",
     #
     "filter": False,
+    "filter_threshold": 0.75,
+    #
+    "workers": 1,
+    "fetcher": "selenium",
+    "parser": "selectolax",
+    "extraction": "html",
+    "engine": "driver",
+    "concurrency": 4,
+    "rate": 2.0,
+    "cache_ttl": 6,  # hours, 0 disables the page cache
+    "cache_size": 256,  # MB
+    "incremental": False,
+    "incremental_age": 24,  # hours
+    "output_formats": ["xlsx"],
+    "history": True,
+    "tracing": True,
+    "pool": False,
+    "pool_max_age": 60,  # minutes
+    "pool_max_pages": 500,
+    "pool_idle": 10,  # minutes
+    "lean_pages": False,
+    "page_load": "normal",
+    # URL patterns lean pages drop, '*' matches anything. The consent script
+    # (usercentrics) is not blocked, set_location removes its overlay
+    "blocked_urls": [
+        "*.png*",
+        "*.jpg*",
+        "*.jpeg*",
+        "*.gif*",
+        "*.webp*",
+        "*.avif*",
+        "*.svg*",
+        "*.ico*",
+        "*.woff*",
+        "*.ttf*",
+        "*.otf*",
+        "*.mp4*",
+        "*.webm*",
+        "*googletagmanager.com*",
+        "*google-analytics.com*",
+        "*doubleclick.net*",
+        "*googlesyndication.com*",
+        "*facebook.net*",
+        "*hotjar.com*",
+        "*criteo.com*",
+    ],
 }
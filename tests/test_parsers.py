@@ -0,0 +1,82 @@
+"""Every parser backend extracts the same records from the recorded search pages
+as the original BeautifulSoup html.parser loop did"""
+
+import glob
+import os
+
+import pytest
+from bs4 import BeautifulSoup
+
+from extraction import SELECTORS, ExtractionPlan
+from parsers import PARSERS, LexborHTMLParser, SelectolaxParser, SoupParser, lxml
+from settings import SETTINGS
+
+FIXTURES = sorted(
+    glob.glob(
+        os.path.join(
+            os.path.dirname(__file__), "..", "benchmarks", "fixtures", "*.html"
+        )
+    )
+)
+
+BACKENDS = {
+    "selectolax": (LexborHTMLParser, SelectolaxParser),
+    "lxml": (lxml, lambda: SoupParser("lxml")),
+    "html.parser": (True, lambda: SoupParser("html.parser")),
+}
+
+
+def text(nodes: list) -> str:
+    return "".join([x.text for x in nodes]).rstrip().lower()
+
+
+def reference_parse(html: str, item: str, store_data: dict) -> list:
+    """The card loop of search_page before the parser backends"""
+    results = []
+    for li in BeautifulSoup(html, "html.parser").select("li"):
+        name = li.select(store_data["name"])
+        if len(name) == 0:
+            continue
+
+        i = {"Item": item, "Name": text(name)}
+        i["Date valid"] = text(li.select(store_data["dv"]))
+
+        for field, key in [("Store", "store1"), ("Brand", "brand1")]:
+            a = li.select(store_data[key] + " > a")
+            if len(a) > 0:
+                i[field] = text(a)
+            elif len(li.select(store_data[key])) > 0:
+                i[field] = text(li.select(store_data[key]))
+            else:
+                i[field] = text(li.select(store_data[key] + " > span"))
+
+        price_strong = li.select(store_data["price1"])
+        if len(price_strong) == 0:
+            i["Price"] = text(li.select(store_data["price2"]))
+            i["Note"] = text(li.select(store_data["price3"]))
+        else:
+            i["Price"] = (
+                "".join([x.text for x in price_strong]).split("-")[0].rstrip().lower()
+            )
+
+        results.append(i)
+
+    return results
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_parser_matches_reference(parser: str, path: str) -> None:
+    available, backend = BACKENDS[parser]
+    if available is None:
+        pytest.skip(f"{parser} is not installed")
+
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    item = os.path.basename(path).rsplit("_", 1)[0]
+    selectors = {x: SETTINGS[x] for x in SELECTORS}
+
+    records = ExtractionPlan(backend(), selectors).extract(html, item)
+
+    assert len(records) > 0
+    assert records == reference_parse(html, item, selectors)
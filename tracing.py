@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+
+from settings import SETTINGS
+
+TRACES_DIR = "traces"
+
+_trace = None  # trace of the running scrape, shared by its worker threads
+_spans = threading.local()  # open spans of each thread
+_observers = []  # called with every finished span, traced or not
+
+
+class Trace:
+    """Timed stages of one scrape. Top level spans are recorded as events; spans
+    opened inside another add their duration to it, such as the driver wait of
+    a page"""
+
+    def __init__(self) -> None:
+        self.started = datetime.now()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add(self, event: dict) -> None:
+        with self.lock:
+            self.events.append(event)
+
+    def save(self, directory: str = TRACES_DIR) -> str:
+        """Writes the events as JSON lines, one file per run"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, f"{self.started.strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+        )
+        with open(path, "w", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+        return path
+
+    def summary(self) -> pd.DataFrame:
+        """Count, total and mean seconds per stage and nested stage, with the
+        page bytes and records"""
+        rows = []
+        for event in self.events:
+            rows.append(
+                {
+                    "Stage": event["stage"],
+                    "Seconds": event["seconds"],
+                    "Bytes": event.get("bytes", 0),
+                    "Records": event.get("records", 0),
+                }
+            )
+            for stage, seconds in event.get("spans", {}).items():
+                rows.append(
+                    {"Stage": f"{event['stage']} › {stage}", "Seconds": seconds}
+                )
+
+        if len(rows) == 0:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(rows).fillna(0)
+        summary = df.groupby("Stage", sort=False).agg(
+            Count=("Seconds", "size"),
+            Total=("Seconds", "sum"),
+            Mean=("Seconds", "mean"),
+            Bytes=("Bytes", "sum"),
+            Records=("Records", "sum"),
+        )
+
+        summary = summary.astype({"Bytes": int, "Records": int})
+
+        return summary.round(2).reset_index()
+
+
+def start_trace(store_data: dict) -> Optional[Trace]:
+    global _trace
+
+    _trace = Trace() if store_data.get("tracing", SETTINGS["tracing"]) else None
+
+    return _trace
+
+
+def get_trace() -> Optional[Trace]:
+    return _trace
+
+
+def stop_trace() -> None:
+    global _trace
+
+    _trace = None
+
+
+def add_observer(observer) -> None:
+    """Registers `observer(stage, seconds, event)` to be called as each span,
+    nested ones included, finishes"""
+    _observers.append(observer)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """Times the block as `stage`. The yielded dict takes extra fields, such as
+    bytes or records. Does nothing but yield when no trace is running and no
+    observer is registered"""
+    if _trace is None and len(_observers) == 0:
+        yield fields
+        return
+
+    stack = getattr(_spans, "stack", None)
+    if stack is None:
+        stack = _spans.stack = []
+
+    event = {"stage": stage, **fields}
+    stack.append(event)
+    start = time.perf_counter()
+    try:
+        yield event
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+
+        for observer in _observers:
+            observer(stage, seconds, event)
+
+        if _trace is not None and len(stack) > 0:
+            spans = stack[-1].setdefault("spans", {})
+            spans[stage] = round(spans.get(stage, 0) + seconds, 4)
+        elif _trace is not None:
+            event["seconds"] = round(seconds, 4)
+            event["thread"] = threading.current_thread().name
+            _trace.add(event)